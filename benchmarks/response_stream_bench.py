@@ -0,0 +1,111 @@
+"""Micro-benchmark for response_stream on multi-MB serving endpoint replies.
+
+Run from the repository root:
+    python -m benchmarks.response_stream_bench
+"""
+import json
+import time
+
+from response_stream import iter_response_text
+
+CHUNK_BYTES = 8 * 1024
+REPEATS = 5
+
+
+def make_delta_stream(target_bytes):
+    """NDJSON stream of output_text.delta events followed by the item.done event"""
+    words = []
+    lines = []
+    size = 0
+    i = 0
+    while size < target_bytes:
+        word = f"token{i} "
+        words.append(word)
+        line = json.dumps({"type": "response.output_text.delta", "delta": word}).encode() + b"\n"
+        lines.append(line)
+        size += len(line)
+        i += 1
+    done = {"type": "response.output_item.done",
+            "item": {"content": [{"type": "output_text", "text": "".join(words)}]}}
+    lines.append(json.dumps(done).encode() + b"\n")
+    return b"".join(lines)
+
+
+def make_document(target_bytes):
+    """Single non-streamed JSON document with a large output list"""
+    text = "x" * 1000
+    count = max(1, target_bytes // 1100)
+    output = [{"content": [{"type": "output_text", "text": text}]} for _ in range(count)]
+    return json.dumps({"output": output}).encode()
+
+
+def chunked(body, size=CHUNK_BYTES):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def baseline(body):
+    """Previous approach: decode the whole body, split lines, json.loads each"""
+    texts = []
+    raw = body.decode().strip()
+    if "\n" in raw:
+        for line in raw.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                if data.get("type") == "response.output_item.done":
+                    for content in data.get("item", {}).get("content", []):
+                        if content.get("type") == "output_text":
+                            texts.append(content.get("text", ""))
+            except json.JSONDecodeError:
+                continue
+    else:
+        data = json.loads(raw)
+        for msg in data["output"]:
+            for content in msg.get("content", []):
+                if content.get("type") == "output_text":
+                    texts.append(content.get("text", ""))
+    return "\n\n---\n\n".join(texts)
+
+
+def incremental(body):
+    return "".join(iter_response_text(chunked(body)))
+
+
+def first_token_latency(body):
+    start = time.perf_counter()
+    next(iter_response_text(chunked(body)))
+    return time.perf_counter() - start
+
+
+def bench(label, fn, body):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - start)
+    mb = len(body) / (1024 * 1024)
+    print(f"  {label:<12} {best * 1000:8.1f} ms  {mb / best:7.1f} MB/s")
+
+
+def main():
+    for size_mb in (1, 4, 16):
+        target = size_mb * 1024 * 1024
+        stream_body = make_delta_stream(target)
+        document_body = make_document(target)
+        assert incremental(stream_body).strip() == baseline(stream_body).strip()
+        assert incremental(document_body) == baseline(document_body)
+
+        print(f"delta stream, {len(stream_body) / 1e6:.1f} MB")
+        bench("baseline", baseline, stream_body)
+        bench("incremental", incremental, stream_body)
+        print(f"  first token  {first_token_latency(stream_body) * 1e6:8.1f} us")
+        print(f"single document, {len(document_body) / 1e6:.1f} MB")
+        bench("baseline", baseline, document_body)
+        bench("incremental", incremental, document_body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# ==========================================================
+# CONVERSATION CONTEXT BUDGET
+# ==========================================================
+# Rough token estimate; good enough to keep request size bounded
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below so it can replace the original messages as context "
+    "for future questions. Keep facts, figures, names, filters and open questions. "
+    "Reply with the summary only."
+)
+
+
+def estimate_tokens(text):
+    """Approximate token count of a message"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def select_context_start(messages, max_turns, max_tokens):
+    """Index of the oldest message that fits the turn and token budget"""
+    # Walk back from the newest message; the latest one is always kept
+    start = len(messages)
+    turns = 0
+    tokens = 0
+    for idx in range(len(messages) - 1, -1, -1):
+        msg = messages[idx]
+        tokens += estimate_tokens(msg["content"])
+        if start < len(messages) and tokens > max_tokens:
+            break
+        start = idx
+        if msg["role"] == "user":
+            turns += 1
+            if turns >= max_turns:
+                break
+    return start
+
+
+def summary_message(summary):
+    """Context message carrying the rolling summary of older turns"""
+    return {"role": "system", "content": SUMMARY_PREFIX + summary}
+
+
+def build_summary_request(previous_summary, messages):
+    """Conversation to send to the model to fold messages into the summary"""
+    transcript = "\n\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+    if previous_summary:
+        transcript = f"{SUMMARY_PREFIX}{previous_summary}\n\n{transcript}"
+    return [{"role": "user", "content": f"{SUMMARY_INSTRUCTIONS}\n\n{transcript}"}]
+
+
+def build_context(messages, max_turns, max_tokens, summary=None, summary_upto=0, max_gap=None):
+    """Messages to send for this turn: an optional summary plus the recent window
+
+    Messages not yet folded into the summary are sent verbatim, up to
+    max_gap of them; beyond that (summarization keeps failing) the older
+    ones are dropped so the request stays bounded.
+    """
+    start = select_context_start(messages, max_turns, max_tokens)
+    if summary and summary_upto > 0:
+        if max_gap is not None and start - summary_upto > max_gap:
+            return [summary_message(summary)] + messages[start:]
+        return [summary_message(summary)] + messages[min(start, summary_upto):]
+    return messages[start:]
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# ==========================================================
+# CONFIGURATION
+# ==========================================================
+# Threads available for chatbot calls across all sessions
+CHAT_WORKERS = int(st.secrets.get('CHAT_WORKERS', 8))
+
+# Requests one user may have in flight at the same time
+CHAT_MAX_PER_USER = int(st.secrets.get('CHAT_MAX_PER_USER', 2))
+
+# ==========================================================
+# REQUESTS
+# ==========================================================
+class ChatRequest:
+    """A chatbot call running on the worker pool; the page polls it for text"""
+
+    def __init__(self, owner, chat_id):
+        self.owner = owner
+        self.chat_id = chat_id
+        self.submitted_at = time.time()
+        self.future = None
+        self.error = None
+        self._on_release = None  # frees the owner's slot; runs once, on cancel or completion
+        self._chunks = []
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def append(self, text):
+        with self._lock:
+            self._chunks.append(text)
+
+    def text(self):
+        """Reply text received so far"""
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def release(self):
+        """Give the owner's slot back to the pool (only the first call counts)"""
+        with self._lock:
+            on_release, self._on_release = self._on_release, None
+        if on_release is not None:
+            on_release()
+
+    def cancel(self):
+        """Drop the request if queued, or stop it at the next received chunk
+
+        A call already waiting on the endpoint cannot be interrupted, so its
+        slot is freed right away instead of when the call returns.
+        """
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+        self.release()
+
+# ==========================================================
+# POOL
+# ==========================================================
+class ChatWorkerPool:
+    """Bounded thread pool for chatbot calls with a per-user concurrency limit"""
+
+    def __init__(self, max_workers=CHAT_WORKERS, max_per_user=CHAT_MAX_PER_USER):
+        self.max_per_user = max_per_user
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-worker")
+        self._active = defaultdict(int)  # owner -> requests queued or running
+        self._lock = threading.Lock()
+
+    def active_for(self, owner):
+        with self._lock:
+            return self._active[owner]
+
+    def submit(self, owner, chat_id, work):
+        """Run work(request) in the pool; None if the user is at their limit"""
+        with self._lock:
+            if self._active[owner] >= self.max_per_user:
+                return None
+            self._active[owner] += 1
+
+        request = ChatRequest(owner, chat_id)
+        request._on_release = lambda: self._release(owner)
+        request.future = self._executor.submit(self._run, request, work)
+        # Also fires when a queued request is cancelled before it starts
+        request.future.add_done_callback(lambda _: request.release())
+        return request
+
+    def _release(self, owner):
+        with self._lock:
+            self._active[owner] -= 1
+            if self._active[owner] <= 0:
+                del self._active[owner]
+
+    def _run(self, request, work):
+        if request.cancelled:
+            return
+        try:
+            work(request)
+        except Exception as e:
+            request.error = str(e)
+
+
+@st.cache_resource
+def get_chat_worker_pool():
+    """Process-wide pool shared by every session"""
+    return ChatWorkerPool()
@@ -0,0 +1,78 @@
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ==========================================================
+# CONFIGURATION
+# ==========================================================
+DATABRICKS_INSTANCE = st.secrets.get('DATABRICKS_INSTANCE')
+DATABRICKS_TOKEN = st.secrets.get('DB_token')
+
+# Connections kept open per host; sized for concurrent sessions polling at once
+POOL_MAXSIZE = int(st.secrets.get('DATABRICKS_POOL_SIZE', 32))
+
+# (connect, read) timeouts in seconds per kind of endpoint
+TIMEOUTS = {
+    'jobs': (5, 30),
+    'fs_list': (5, 60),
+    'fs_file': (5, 60),
+    'serving': (5, 300),
+    'default': (5, 30),
+}
+
+# Idempotent calls are retried on throttling and transient server errors.
+# POSTs are never retried so a job is not submitted twice.
+RETRY_POLICY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+# ==========================================================
+# CLIENT
+# ==========================================================
+class DatabricksClient:
+    """Pooled keep-alive HTTP client for the Databricks REST APIs"""
+
+    def __init__(self, instance, token, pool_maxsize=POOL_MAXSIZE):
+        self.instance = (instance or "").rstrip("/")
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json"
+        })
+
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            max_retries=RETRY_POLICY
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path):
+        """Resolve an API path against the workspace URL (full URLs pass through)"""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.instance}{path}"
+
+    def request(self, method, path, endpoint='default', **kwargs):
+        """Send a request using the pooled session and the endpoint's timeout"""
+        kwargs.setdefault('timeout', TIMEOUTS.get(endpoint, TIMEOUTS['default']))
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path, endpoint='default', **kwargs):
+        return self.request("GET", path, endpoint, **kwargs)
+
+    def post(self, path, endpoint='default', **kwargs):
+        return self.request("POST", path, endpoint, **kwargs)
+
+
+@st.cache_resource
+def get_databricks_client():
+    """Single client shared by every session and rerun in this process"""
+    return DatabricksClient(DATABRICKS_INSTANCE, DATABRICKS_TOKEN)
@@ -0,0 +1,282 @@
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+
+import streamlit as st
+
+from databricks_client import get_databricks_client
+
+# ==========================================================
+# CONFIGURATION
+# ==========================================================
+# Longest the poller sleeps between checks, even when no run is due
+POLL_INTERVAL_SECONDS = float(st.secrets.get('JOB_POLL_INTERVAL_SECONDS', 5))
+
+# Per-run adaptive schedule: fast right after submit, then each poll waits
+# POLL_BACKOFF times longer up to the maximum, +/- POLL_JITTER so runs
+# submitted together do not hit the Jobs API in lockstep
+POLL_MIN_SECONDS = float(st.secrets.get('JOB_POLL_MIN_SECONDS', 1))
+POLL_MAX_SECONDS = float(st.secrets.get('JOB_POLL_MAX_SECONDS', 30))
+POLL_BACKOFF = 1.5
+POLL_JITTER = 0.2
+
+# Terminal statuses never change, so they are kept (and never re-polled);
+# only the oldest beyond this many are dropped
+TERMINAL_CACHE_MAX_RUNS = 1000
+
+# Window for the Jobs API calls-per-minute metric
+API_RATE_WINDOW_SECONDS = 60
+
+TERMINAL_STATES = ('TERMINATED', 'SKIPPED', 'INTERNAL_ERROR')
+
+# runs/list returns at most 25 runs per page
+RUNS_LIST_PAGE_SIZE = 25
+RUNS_LIST_MAX_PAGES = 4
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+def parse_run_state(run):
+    """Extract the status fields the pages care about from a run object"""
+    state = run.get('state', {})
+    life_cycle_state = state.get('life_cycle_state', 'UNKNOWN')
+    return {
+        'life_cycle_state': life_cycle_state,
+        'result_state': state.get('result_state', None),
+        'is_terminal': life_cycle_state in TERMINAL_STATES
+    }
+
+def next_poll_delay(polls):
+    """Seconds until the next poll of a run that has been polled this many times"""
+    delay = min(POLL_MAX_SECONDS, POLL_MIN_SECONDS * POLL_BACKOFF ** polls)
+    return delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+def parse_task_states(run):
+    """Per-task status of a multi-task run, keyed by task_key"""
+    return {
+        task['task_key']: dict(parse_run_state(task), run_id=task.get('run_id'), output_path=None,
+                               output_fetched=False)
+        for task in run.get('tasks', []) if task.get('task_key')
+    }
+
+def parse_output_path(result):
+    """Pull a PDF path out of a notebook exit value (plain path or JSON)"""
+    if not result:
+        return None
+    result = result.strip()
+    if result.startswith('{'):
+        try:
+            data = json.loads(result)
+        except json.JSONDecodeError:
+            return None
+        for key in ('output_path', 'pdf_path', 'file_path', 'path'):
+            if isinstance(data.get(key), str):
+                result = data[key].strip()
+                break
+        else:
+            return None
+    return result if result.lower().endswith('.pdf') else None
+
+# ==========================================================
+# POLLER
+# ==========================================================
+class JobStatusPoller:
+    """Single background thread that polls every tracked run for all sessions"""
+
+    def __init__(self, client, interval=POLL_INTERVAL_SECONDS):
+        self.client = client
+        self.interval = interval
+        self._runs = {}  # run_id -> status dict
+        self._api_calls = Counter()  # Jobs API path -> calls
+        self._recent_calls = deque()  # call timestamps within API_RATE_WINDOW_SECONDS
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="job-status-poller", daemon=True)
+        self._thread.start()
+
+    def track(self, run_id, start_time=None, tasks=False):
+        """Start tracking a run (no-op if it is already tracked)
+
+        With tasks=True the per-task states and outputs of a multi-task run
+        are tracked as well.
+        """
+        with self._lock:
+            if run_id in self._runs:
+                return
+            self._runs[run_id] = {
+                'life_cycle_state': 'PENDING',
+                'result_state': None,
+                'is_terminal': False,
+                'output_path': None,
+                'start_time': start_time or time.time(),
+                'updated_at': None,
+                'tasks': {} if tasks else None,
+                'polls': 0,
+                'poll_interval': POLL_MIN_SECONDS,
+                'next_poll_at': time.time()
+            }
+        self._wake.set()
+
+    def get_status(self, run_id):
+        """Latest known status of a run, or None if it is not tracked"""
+        with self._lock:
+            status = self._runs.get(run_id)
+            if not status:
+                return None
+            status = dict(status)
+            if status['tasks'] is not None:
+                status['tasks'] = {key: dict(task) for key, task in status['tasks'].items()}
+            return status
+
+    def metrics(self):
+        """Jobs API traffic of the poller: totals, recent rate and per active run"""
+        now = time.time()
+        with self._lock:
+            while self._recent_calls and now - self._recent_calls[0] > API_RATE_WINDOW_SECONDS:
+                self._recent_calls.popleft()
+            active = sum(1 for s in self._runs.values() if not s['is_terminal'])
+            calls_per_minute = len(self._recent_calls) * 60 / API_RATE_WINDOW_SECONDS
+            return {
+                'active_runs': active,
+                'api_calls': dict(self._api_calls),
+                'calls_per_minute': calls_per_minute,
+                'calls_per_minute_per_run': calls_per_minute / active if active else 0.0
+            }
+
+    def _get(self, path, params):
+        with self._lock:
+            self._api_calls[path.rsplit('/', 1)[-1]] += 1
+            self._recent_calls.append(time.time())
+        return self.client.get(path, endpoint='jobs', params=params)
+
+    def _seconds_until_due(self):
+        with self._lock:
+            due = [s['next_poll_at'] for s in self._runs.values() if not s['is_terminal']]
+        if not due:
+            return self.interval
+        return min(self.interval, max(0.0, min(due) - time.time()))
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self._seconds_until_due())
+            self._wake.clear()
+            try:
+                self.poll_once()
+            except Exception:
+                # Never let a bad response kill the shared poller, nor spin on it
+                time.sleep(POLL_MIN_SECONDS)
+
+    def poll_once(self, force=False):
+        """Refresh the non-terminal runs that are due (all of them with force=True)"""
+        now = time.time()
+        with self._lock:
+            terminal = sorted((s['updated_at'] or now, r) for r, s in self._runs.items() if s['is_terminal'])
+            for _, run_id in terminal[:max(0, len(terminal) - TERMINAL_CACHE_MAX_RUNS)]:
+                del self._runs[run_id]
+            pending = {r: s['start_time'] for r, s in self._runs.items()
+                       if not s['is_terminal'] and (force or s['next_poll_at'] <= now)}
+            known_tasks = {r: s['tasks'] for r, s in self._runs.items()
+                           if r in pending and s['tasks'] is not None}
+
+        if not pending:
+            return
+
+        statuses = {}
+        awaiting_output = set()  # successful runs whose output path is not fetched yet
+        try:
+            statuses.update(self._fetch_statuses({r: t for r, t in pending.items() if r not in known_tasks}))
+            statuses.update(self._fetch_task_statuses(known_tasks))
+            awaiting_output = {r for r, s in statuses.items()
+                               if s['is_terminal'] and s['result_state'] == 'SUCCESS' and 'tasks' not in s}
+            for run_id in list(awaiting_output):
+                # Ask a finished run where it wrote its report instead of rescanning the volume
+                statuses[run_id]['output_path'] = self._fetch_output_path(run_id)
+                awaiting_output.discard(run_id)
+        finally:
+            # Also runs when a fetch raised (connection error, bad JSON): keep
+            # what was fetched and back off every polled run so errors do not
+            # hammer the API
+            with self._lock:
+                for run_id in pending:
+                    entry = self._runs.get(run_id)
+                    if entry is None:
+                        continue
+                    # A run is only marked finished together with its output path
+                    if run_id in statuses and run_id not in awaiting_output:
+                        entry.update(statuses[run_id], updated_at=now)
+                    entry['polls'] += 1
+                    entry['poll_interval'] = next_poll_delay(entry['polls'])
+                    entry['next_poll_at'] = now + entry['poll_interval']
+
+    def _fetch_task_statuses(self, known_tasks):
+        """runs/get for multi-task runs; outputs are fetched once per finished task"""
+        statuses = {}
+        for run_id, previous in known_tasks.items():
+            response = self._get("/api/2.1/jobs/runs/get", {"run_id": run_id})
+            if response.status_code != 200:
+                continue
+            run = response.json()
+            tasks = parse_task_states(run)
+            for task_key, task in tasks.items():
+                earlier = previous.get(task_key)
+                if earlier and earlier['output_fetched']:
+                    # Asked already, whether or not the notebook returned a path
+                    task['output_path'] = earlier['output_path']
+                    task['output_fetched'] = True
+                elif task['is_terminal'] and task['result_state'] == 'SUCCESS' and task['run_id']:
+                    task['output_path'] = self._fetch_output_path(task['run_id'])
+                    task['output_fetched'] = True
+            statuses[run_id] = dict(parse_run_state(run), tasks=tasks)
+        return statuses
+
+    def _fetch_statuses(self, pending):
+        """Fetch many runs with a few runs/list pages, falling back to runs/get"""
+        if not pending:
+            return {}
+        wanted = set(pending)
+        statuses = {}
+        params = {
+            "run_type": "SUBMIT_RUN",
+            "limit": RUNS_LIST_PAGE_SIZE,
+            "start_time_from": int(min(pending.values()) * 1000) - 60000
+        }
+
+        for _ in range(RUNS_LIST_MAX_PAGES):
+            response = self._get("/api/2.1/jobs/runs/list", params)
+            if response.status_code != 200:
+                break
+            data = response.json()
+            for run in data.get('runs', []):
+                if run.get('run_id') in wanted:
+                    statuses[run['run_id']] = parse_run_state(run)
+            if wanted <= statuses.keys() or not data.get('has_more') or not data.get('next_page_token'):
+                break
+            params["page_token"] = data['next_page_token']
+
+        for run_id in wanted - statuses.keys():
+            response = self._get("/api/2.1/jobs/runs/get", {"run_id": run_id})
+            if response.status_code == 200:
+                statuses[run_id] = parse_run_state(response.json())
+
+        return statuses
+
+    def _fetch_output_path(self, run_id):
+        """Report path returned by the notebook via dbutils.notebook.exit, if any
+
+        Throttling and server errors raise, so the run is asked again on the
+        next poll instead of being finished without its output.
+        """
+        response = self._get("/api/2.1/jobs/runs/get-output", {"run_id": run_id})
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        if response.status_code != 200:
+            return None
+        return parse_output_path(response.json().get('notebook_output', {}).get('result'))
+
+
+@st.cache_resource
+def get_job_poller():
+    """Process-wide poller shared by every session"""
+    return JobStatusPoller(get_databricks_client())
@@ -0,0 +1,338 @@
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+import requests
+import streamlit as st
+
+from databricks_client import get_databricks_client
+from job_poller import get_job_poller, POLL_INTERVAL_SECONDS
+from text_utils import normalize_text
+
+# ==========================================================
+# CONFIGURATION
+# ==========================================================
+CLUSTER_ID = st.secrets.get('CLUSTER_ID')
+NOTEBOOK_PATH = st.secrets.get('NOTEBOOK_PATH')
+VOLUME_PATH = st.secrets.get('VOLUME_PATH')
+
+# Notebook runs allowed on the shared cluster at the same time
+MAX_CONCURRENT_RUNS = int(st.secrets.get('REPORT_MAX_CONCURRENT_RUNS', 3))
+
+# 'fair' serves the user with the fewest running jobs first, 'fifo' strict arrival order
+QUEUE_POLICY = str(st.secrets.get('REPORT_QUEUE_POLICY', 'fair')).lower()
+
+# How long finished jobs stay listed in the queue
+TERMINAL_RETENTION_SECONDS = 3600
+
+# A finished report answers identical requests for this long (seconds, 0 disables)
+REPORT_REUSE_SECONDS = int(st.secrets.get('REPORT_REUSE_SECONDS', 900))
+
+# Batch mode: notebook tasks of one batch running side by side, and batch size limit
+BATCH_MAX_PARALLEL_TASKS = int(st.secrets.get('REPORT_BATCH_MAX_PARALLEL', 4))
+BATCH_MAX_QUERIES = int(st.secrets.get('REPORT_BATCH_MAX_QUERIES', 50))
+
+QUEUED, SUBMITTED, FAILED = 'QUEUED', 'SUBMITTED', 'FAILED'
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+def build_run_payload(query):
+    """runs/submit body for one report notebook run"""
+    return {
+        "run_name": f"ai_report_{int(time.time())}",
+        "existing_cluster_id": CLUSTER_ID,
+        "notebook_task": {
+            "notebook_path": NOTEBOOK_PATH,
+            "base_parameters": {"user_question": query}
+        }
+    }
+
+def batch_task_key(index):
+    return f"report_{index + 1}"
+
+def build_batch_payload(queries, max_parallel):
+    """runs/submit body running one notebook task per query, max_parallel at a time
+
+    Task i waits for task i - max_parallel, so the tasks form max_parallel
+    chains; ALL_DONE keeps a failed report from skipping the rest of its chain.
+    """
+    tasks = []
+    for index, query in enumerate(queries):
+        task = {
+            "task_key": batch_task_key(index),
+            "existing_cluster_id": CLUSTER_ID,
+            "notebook_task": {
+                "notebook_path": NOTEBOOK_PATH,
+                "base_parameters": {"user_question": query}
+            }
+        }
+        if index >= max_parallel:
+            task["depends_on"] = [{"task_key": batch_task_key(index - max_parallel)}]
+            task["run_if"] = "ALL_DONE"
+        tasks.append(task)
+    return {"run_name": f"ai_report_batch_{int(time.time())}", "tasks": tasks}
+
+def volume_report_path(output_path):
+    """Absolute volume path for a path reported by the notebook"""
+    if output_path.startswith('/'):
+        return output_path
+    return f"{VOLUME_PATH.rstrip('/')}/{output_path}"
+
+def job_key(query, queries=None):
+    """Dedup key of a single request, or of a batch when queries is given"""
+    if queries is None:
+        return normalize_text(query)
+    return "\n".join(["batch"] + [normalize_text(q) for q in queries])
+
+def collect_run_outputs(run_id, status, queries=None):
+    """run_id -> volume PDF path for every report a finished run wrote"""
+    if queries is None:
+        return {run_id: volume_report_path(status['output_path'])} if status.get('output_path') else {}
+    outputs = {}
+    for index in range(len(queries)):
+        task = (status.get('tasks') or {}).get(batch_task_key(index))
+        if task and task['output_path']:
+            outputs[task['run_id']] = volume_report_path(task['output_path'])
+    return outputs
+
+# ==========================================================
+# QUEUE
+# ==========================================================
+class SubmissionQueue:
+    """Process-wide admission control for report runs on the shared cluster"""
+
+    def __init__(self, client, poller, max_running=MAX_CONCURRENT_RUNS, policy=QUEUE_POLICY,
+                 reuse_seconds=REPORT_REUSE_SECONDS, interval=POLL_INTERVAL_SECONDS):
+        self.client = client
+        self.poller = poller
+        self.max_running = max_running
+        self.policy = policy
+        self.reuse_seconds = reuse_seconds
+        self.interval = interval
+        self.on_submit = None  # optional callback(job) once runs/submit has answered
+        self._jobs = {}      # ticket -> job dict
+        self._queue = []     # tickets waiting for a slot, in arrival order
+        self._active = {}    # normalized query -> ticket, while queued or running
+        self._results = {}   # normalized query -> latest successful report
+        self._tickets = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="report-submit-queue", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, owner, query):
+        """Queue a report request; identical active requests are shared, not resubmitted
+
+        Returns (job, deduplicated).
+        """
+        return self._enqueue(owner, query, job_key(query))
+
+    def enqueue_batch(self, owner, queries, max_parallel=BATCH_MAX_PARALLEL_TASKS):
+        """Queue several reports as one multi-task run taking up to max_parallel slots
+
+        Returns (job, deduplicated) like enqueue().
+        """
+        return self._enqueue(owner, f"Batch of {len(queries)} reports", job_key(None, queries),
+                             queries=list(queries), slots=self._batch_slots(queries, max_parallel))
+
+    def adopt(self, owner, query, run_id, submitted_at, queries=None):
+        """Register a run submitted before a restart so it counts against the limit
+
+        Returns (job, deduplicated) like enqueue().
+        """
+        if queries is None:
+            return self._enqueue(owner, query, job_key(query), run_id=run_id, submitted_at=submitted_at)
+        return self._enqueue(owner, query, job_key(None, queries), queries=list(queries),
+                             slots=self._batch_slots(queries, BATCH_MAX_PARALLEL_TASKS),
+                             run_id=run_id, submitted_at=submitted_at)
+
+    def _batch_slots(self, queries, max_parallel):
+        return max(1, min(max_parallel, len(queries), self.max_running))
+
+    def _enqueue(self, owner, query, key, queries=None, slots=1, run_id=None, submitted_at=None):
+        with self._lock:
+            ticket = self._active.get(key)
+            if ticket is not None:
+                job = self._jobs[ticket]
+                job['owners'].add(owner)
+                return dict(job), True
+
+            ticket = next(self._tickets)
+            job = self._jobs[ticket] = {
+                'ticket': ticket,
+                'query': query,
+                'key': key,
+                'queries': queries,  # set for batches, one notebook task per query
+                'slots': slots,
+                'owner': owner,
+                'owners': {owner},
+                'state': QUEUED if run_id is None else SUBMITTED,
+                'run_id': run_id,
+                'error': None,
+                'enqueued_at': time.time(),
+                'submitted_at': submitted_at,
+                'finished_at': None
+            }
+            if run_id is None:
+                self._queue.append(ticket)
+            self._active[key] = ticket
+        self._wake.set()
+        return dict(job), False
+
+    def find_result(self, query):
+        """Report generated for an identical request within the reuse window, or None"""
+        with self._lock:
+            result = self._results.get(normalize_text(query))
+            if result is None or time.time() - result['completed_at'] > self.reuse_seconds:
+                return None
+            return dict(result)
+
+    def _record(self, key, run_id, path):
+        current = self._results.get(key)
+        if current is not None and current['run_id'] == run_id:
+            return
+        self._results[key] = {'run_id': run_id, 'path': path, 'completed_at': time.time()}
+
+    def get(self, ticket):
+        """Snapshot of a queued or submitted job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(ticket)
+            return dict(job) if job else None
+
+    def position(self, ticket):
+        """1-based place of a job in the dispatch order, or None once submitted"""
+        with self._lock:
+            order = self._dispatch_order(self._running_by_owner())
+            return order.index(ticket) + 1 if ticket in order else None
+
+    def stats(self):
+        with self._lock:
+            return {'queued': len(self._queue), 'running': sum(self._running_by_owner().values())}
+
+    def cancel(self, owner, ticket):
+        """Stop following a job; a queued job nobody follows any more is dropped"""
+        with self._lock:
+            job = self._jobs.get(ticket)
+            if job is None:
+                return
+            job['owners'].discard(owner)
+            if job['state'] == QUEUED and not job['owners']:
+                self._queue.remove(ticket)
+                self._finish(job)
+                del self._jobs[ticket]
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.dispatch()
+            except Exception:
+                # Never let a bad response kill the shared queue
+                pass
+
+    def _finish(self, job):
+        job['finished_at'] = time.time()
+        if self._active.get(job['key']) == job['ticket']:
+            del self._active[job['key']]
+
+    def _running_by_owner(self):
+        """Cluster slots taken by runs still executing, per submitting user (lock held)"""
+        running = defaultdict(int)
+        for job in self._jobs.values():
+            if job['state'] == SUBMITTED and job['finished_at'] is None:
+                running[job['owner']] += job['slots']
+        return running
+
+    def _dispatch_order(self, running):
+        """Queued tickets in the order they will get a slot (lock held)"""
+        if self.policy != 'fair':
+            return list(self._queue)
+        # Round-robin between users, weighted by what each already has running
+        order = []
+        load = dict(running)
+        pending = list(self._queue)
+        while pending:
+            ticket = min(pending, key=lambda t: (load.get(self._jobs[t]['owner'], 0), pending.index(t)))
+            pending.remove(ticket)
+            order.append(ticket)
+            owner = self._jobs[ticket]['owner']
+            load[owner] = load.get(owner, 0) + self._jobs[ticket]['slots']
+        return order
+
+    def _record_outputs(self, job, status):
+        """Add the PDFs of a finished run to the result index (lock held)"""
+        outputs = collect_run_outputs(job['run_id'], status, job['queries'])
+        if job['queries'] is None:
+            if status['result_state'] == 'SUCCESS' and outputs:
+                self._record(job['key'], job['run_id'], outputs[job['run_id']])
+            return
+        for index, query in enumerate(job['queries']):
+            task = (status['tasks'] or {}).get(batch_task_key(index))
+            if task and task['run_id'] in outputs:
+                self._record(normalize_text(query), task['run_id'], outputs[task['run_id']])
+
+    def dispatch(self):
+        """Retire finished runs and submit queued jobs while slots are free"""
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                if job['state'] == SUBMITTED and job['finished_at'] is None and job['run_id'] is not None:
+                    status = self.poller.get_status(job['run_id'])
+                    if status is None or status['is_terminal']:
+                        self._finish(job)
+                        if status is not None:
+                            self._record_outputs(job, status)
+            for ticket in [t for t, j in self._jobs.items()
+                           if j['finished_at'] and now - j['finished_at'] > TERMINAL_RETENTION_SECONDS]:
+                del self._jobs[ticket]
+            for key in [k for k, r in self._results.items() if now - r['completed_at'] > self.reuse_seconds]:
+                del self._results[key]
+
+        while True:
+            with self._lock:
+                running = self._running_by_owner()
+                if not self._queue:
+                    return
+                ticket = self._dispatch_order(running)[0]
+                if sum(running.values()) + self._jobs[ticket]['slots'] > self.max_running:
+                    return
+                self._queue.remove(ticket)
+                job = self._jobs[ticket]
+                # Counts as running while the submit call is in flight
+                job['state'] = SUBMITTED
+
+            if job['queries'] is None:
+                payload = build_run_payload(job['query'])
+            else:
+                payload = build_batch_payload(job['queries'], job['slots'])
+            run_id, error = None, None
+            try:
+                response = self.client.post("/api/2.1/jobs/runs/submit", endpoint='jobs', json=payload)
+                if response.status_code == 200:
+                    run_id = response.json().get("run_id")
+                else:
+                    error = f"{response.status_code} - {response.text}"
+            except requests.exceptions.RequestException as e:
+                error = f"Connection Error: {e}"
+
+            if run_id is not None:
+                self.poller.track(run_id, tasks=job['queries'] is not None)
+            with self._lock:
+                job['run_id'] = run_id
+                job['submitted_at'] = time.time()
+                if run_id is None:
+                    job['state'] = FAILED
+                    job['error'] = error
+                    self._finish(job)
+                snapshot = dict(job)
+            if self.on_submit is not None:
+                self.on_submit(snapshot)
+
+
+@st.cache_resource
+def get_submission_queue():
+    """Process-wide queue shared by every session"""
+    return SubmissionQueue(get_databricks_client(), get_job_poller())
@@ -0,0 +1,194 @@
+import json
+import time
+
+import requests
+import streamlit as st
+
+from sqlite_db import get_pool, migrate
+from job_poller import get_job_poller
+from job_queue import get_submission_queue, collect_run_outputs
+
+# ==========================================================
+# CONFIGURATION
+# ==========================================================
+# Local SQLite file holding the report jobs each user is following
+JOB_DB_FILE = st.secrets.get('REPORT_JOBS_DB', 'report_jobs.db')
+
+# Finished jobs are kept this long (days) before being purged
+JOB_RETENTION_DAYS = int(st.secrets.get('REPORT_JOB_RETENTION_DAYS', 7))
+
+QUEUED_STATUS, RUNNING_STATUS, FAILED_STATUS = 'QUEUED', 'RUNNING', 'FAILED'
+ACTIVE_STATUSES = (QUEUED_STATUS, RUNNING_STATUS)
+
+# ==========================================================
+# SCHEMA
+# ==========================================================
+def _create_report_jobs(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            job_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            query TEXT NOT NULL,
+            job_key TEXT NOT NULL,
+            batch TEXT,
+            run_id INTEGER,
+            start_time REAL NOT NULL,
+            status TEXT NOT NULL,
+            outputs TEXT,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_report_jobs_owner_status ON report_jobs(owner, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_report_jobs_status_key ON report_jobs(status, job_key)")
+
+# Append only; see CHAT_MIGRATIONS in the chatbot page
+JOB_MIGRATIONS = [
+    _create_report_jobs,
+]
+
+# ==========================================================
+# STORE
+# ==========================================================
+def _row_to_job(row):
+    return {
+        'job_id': row['job_id'],
+        'owner': row['owner'],
+        'query': row['query'],
+        'batch': json.loads(row['batch']) if row['batch'] else None,
+        'run_id': row['run_id'],
+        'start_time': row['start_time'],
+        'status': row['status'],
+        'outputs': {int(k): v for k, v in json.loads(row['outputs']).items()} if row['outputs'] else {}
+    }
+
+
+class JobStore:
+    """Report jobs followed by each user, kept across page refreshes and restarts"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def add(self, job_id, owner, query, job_key, start_time, run_id=None, batch=None):
+        """Record a job a user started following"""
+        status = QUEUED_STATUS if run_id is None else RUNNING_STATUS
+        with self.pool.connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO report_jobs
+                    (job_id, owner, query, job_key, batch, run_id, start_time, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, owner, query, job_key, json.dumps(batch) if batch else None,
+                  run_id, start_time, status, time.time()))
+            conn.commit()
+
+    def mark_submitted(self, job):
+        """Submission queue callback: attach the run id (or the failure) to queued rows"""
+        with self.pool.connection() as conn:
+            if job['run_id'] is None:
+                conn.execute(
+                    "UPDATE report_jobs SET status = ?, updated_at = ? WHERE status = ? AND job_key = ?",
+                    (FAILED_STATUS, time.time(), QUEUED_STATUS, job['key'])
+                )
+            else:
+                conn.execute(
+                    "UPDATE report_jobs SET run_id = ?, start_time = ?, status = ?, updated_at = ? "
+                    "WHERE status = ? AND job_key = ?",
+                    (job['run_id'], job['submitted_at'], RUNNING_STATUS, time.time(), QUEUED_STATUS, job['key'])
+                )
+            conn.commit()
+
+    def finish(self, job_id, status, outputs=None):
+        """Store the final state of a job and the PDFs it produced"""
+        with self.pool.connection() as conn:
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, outputs = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(outputs) if outputs else None, time.time(), job_id)
+            )
+            conn.commit()
+
+    def remove(self, owner, job_id):
+        """Forget a job the user stopped following"""
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM report_jobs WHERE job_id = ? AND owner = ?", (job_id, owner))
+            conn.commit()
+
+    def load_for_owner(self, owner, completed_since):
+        """(active jobs, run_id -> PDF path of jobs finished since the given time)"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM report_jobs WHERE owner = ? AND (status IN (?, ?) OR updated_at >= ?) "
+                "ORDER BY start_time",
+                (owner, *ACTIVE_STATUSES, completed_since)
+            ).fetchall()
+
+        active, completed = [], {}
+        for job in map(_row_to_job, rows):
+            if job['status'] in ACTIVE_STATUSES:
+                active.append(job)
+            else:
+                completed.update(job['outputs'])
+        return active, completed
+
+    def active_jobs(self):
+        """Every user's queued and running jobs"""
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT * FROM report_jobs WHERE status IN (?, ?)", ACTIVE_STATUSES).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def purge(self, before):
+        """Drop finished jobs last updated before the given time"""
+        with self.pool.connection() as conn:
+            conn.execute(
+                "DELETE FROM report_jobs WHERE status NOT IN (?, ?) AND updated_at < ?",
+                (*ACTIVE_STATUSES, before)
+            )
+            conn.commit()
+
+# ==========================================================
+# STARTUP RECONCILIATION
+# ==========================================================
+def reconcile(store, submission_queue, poller):
+    """Refresh every stored job once after startup so none is orphaned or resubmitted
+
+    Runs are re-tracked and refreshed in one forced poller sweep (a few
+    runs/list pages); finished ones are recorded, still-running ones count
+    against the submission limit again, and jobs that were waiting in the
+    lost in-memory queue are queued again.
+    """
+    store.purge(time.time() - JOB_RETENTION_DAYS * 86400)
+    jobs = store.active_jobs()
+    running = [job for job in jobs if job['run_id'] is not None]
+
+    for job in running:
+        poller.track(job['run_id'], job['start_time'], tasks=job['batch'] is not None)
+    if running:
+        try:
+            poller.poll_once(force=True)
+        except (requests.exceptions.RequestException, ValueError):
+            # Statuses arrive on the poller's normal schedule instead
+            pass
+
+    for job in running:
+        status = poller.get_status(job['run_id'])
+        if status is not None and status['is_terminal']:
+            store.finish(job['job_id'], status['result_state'] or status['life_cycle_state'],
+                         collect_run_outputs(job['run_id'], status, job['batch']))
+        else:
+            submission_queue.adopt(job['owner'], job['query'], job['run_id'], job['start_time'], queries=job['batch'])
+
+    for job in jobs:
+        if job['run_id'] is None:
+            if job['batch']:
+                submission_queue.enqueue_batch(job['owner'], job['batch'])
+            else:
+                submission_queue.enqueue(job['owner'], job['query'])
+
+
+@st.cache_resource
+def get_job_store():
+    """Process-wide job store, migrated and reconciled once per process"""
+    store = JobStore(get_pool(JOB_DB_FILE))
+    migrate(store.pool, JOB_MIGRATIONS)
+    submission_queue = get_submission_queue()
+    submission_queue.on_submit = store.mark_submitted
+    reconcile(store, submission_queue, get_job_poller())
+    return store
@@ -1,9 +1,22 @@
 import streamlit as st
 import requests
-import json
+import os
 import time
+import csv
+import io
+import uuid
+import html
 import pandas as pd
 from datetime import datetime
+from report_cache import ReportCache
+from databricks_client import get_databricks_client
+from job_poller import get_job_poller
+from job_queue import get_submission_queue, volume_report_path, collect_run_outputs, job_key, BATCH_MAX_QUERIES, FAILED
+from job_store import get_job_store, FAILED_STATUS
+from user_identity import get_user_id
+from text_utils import normalize_text
+from volume_snapshot import get_volume_snapshot
+from report_export import build_reports_zip
 
 # ==========================================================
 # CONFIGURATION — UPDATE THESE VALUES
@@ -15,6 +28,27 @@ VOLUME_PATH = st.secrets.get('VOLUME_PATH')
 CLUSTER_ID = st.secrets.get('CLUSTER_ID')
 CHATBOT_ENDPOINT=st.secrets.get('CHATBOT_ENDPOINT')
 
+# Max number of reports kept ready for download per session
+REPORT_BYTES_CACHE_ENTRIES = int(st.secrets.get('REPORT_BYTES_CACHE_ENTRIES', 20))
+
+# How often the Active Jobs panel refreshes itself (seconds)
+JOBS_PANEL_REFRESH_SECONDS = float(st.secrets.get('JOBS_PANEL_REFRESH_SECONDS', 5))
+
+# Page size choices for the Generated Reports list
+REPORT_PAGE_SIZES = [10, 25, 50, 100]
+
+# Finished jobs from the last this many hours are highlighted again after a refresh
+COMPLETED_JOBS_REHYDRATE_HOURS = 24
+
+# Local on-disk cache for downloaded report PDFs
+REPORT_CACHE_DIR = st.secrets.get('REPORT_CACHE_DIR', '.report_cache')
+REPORT_CACHE_MAX_MB = int(st.secrets.get('REPORT_CACHE_MAX_MB', 512))
+
+# Bulk ZIP exports are written here; old archives are swept on each export
+REPORT_EXPORT_DIR = st.secrets.get('REPORT_EXPORT_DIR', '.report_exports')
+# Largest total size of the PDFs going into one bulk export
+REPORT_EXPORT_MAX_MB = int(st.secrets.get('REPORT_EXPORT_MAX_MB', 500))
+
 # ==========================================================
 # PAGE CONFIG
 # ==========================================================
@@ -38,12 +72,49 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 # ==========================================================
 # INITIALIZE SESSION STATE
 # ==========================================================
+# Fair-share key in the submission queue and owner of persisted jobs
+st.session_state.queue_owner = get_user_id()
+
+def rehydrate_jobs(owner):
+    """Jobs this user was following before a refresh or restart, from the job store"""
+    active, completed = get_job_store().load_for_owner(owner, time.time() - COMPLETED_JOBS_REHYDRATE_HOURS * 3600)
+    submission_queue = get_submission_queue()
+    jobs = []
+    for stored in active:
+        # Re-attach to the shared queue; identical keys resolve to the same job
+        if stored['run_id'] is not None:
+            job, _ = submission_queue.adopt(owner, stored['query'], stored['run_id'], stored['start_time'],
+                                            queries=stored['batch'])
+        elif stored['batch']:
+            job, _ = submission_queue.enqueue_batch(owner, stored['batch'])
+        else:
+            job, _ = submission_queue.enqueue(owner, stored['query'])
+        entry = {
+            'job_id': stored['job_id'],
+            'ticket': job['ticket'],
+            'run_id': stored['run_id'] or job['run_id'],
+            'query': stored['query'],
+            'start_time': stored['start_time']
+        }
+        if stored['batch']:
+            entry['batch'] = stored['batch']
+        jobs.append(entry)
+    return jobs, completed
+
 if 'monitoring_jobs' not in st.session_state:
-    st.session_state.monitoring_jobs = []
+    st.session_state.monitoring_jobs, st.session_state.completed_jobs = rehydrate_jobs(st.session_state.queue_owner)
 if 'completed_jobs' not in st.session_state:
-    st.session_state.completed_jobs = []
-if 'jobs_placeholder' not in st.session_state:
-    st.session_state.jobs_placeholder = None
+    st.session_state.completed_jobs = {}  # run_id -> PDF path written by the run
+if 'prepared_reports' not in st.session_state:
+    st.session_state.prepared_reports = []
+if 'listing_version' not in st.session_state:
+    st.session_state.listing_version = None
+if 'new_reports' not in st.session_state:
+    st.session_state.new_reports = set()
+if 'report_page' not in st.session_state:
+    st.session_state.report_page = 0
+if 'bulk_export' not in st.session_state:
+    st.session_state.bulk_export = None
 
 # ==========================================================
 # MODERN CSS STYLING
@@ -400,56 +471,139 @@ st.markdown("""
 # ==========================================================
 # HELPER FUNCTIONS WITH CACHING
 # ==========================================================
-@st.cache_data(ttl=30)
-def check_job_status(run_id):
-    """Check the status of a Databricks job run"""
-    headers = {
-        "Authorization": f"Bearer {DATABRICKS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
-    status_url = f"{DATABRICKS_INSTANCE}/api/2.1/jobs/runs/get?run_id={run_id}"
-    
-    try:
-        response = requests.get(status_url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            state = data.get('state', {})
-            life_cycle_state = state.get('life_cycle_state', 'UNKNOWN')
-            result_state = state.get('result_state', None)
-            
-            return {
-                'life_cycle_state': life_cycle_state,
-                'result_state': result_state,
-                'is_terminal': life_cycle_state in ['TERMINATED', 'SKIPPED', 'INTERNAL_ERROR']
-            }
-    except:
-        pass
-    
-    return None
+@st.cache_data(ttl=60, max_entries=32, show_spinner=False)
+def filter_reports(listing_version, date_filter):
+    """Filter and format the cached listing once per (listing version, filter) pair"""
+    # listing_version is only part of the cache key
+    pdf_df = get_volume_snapshot().pdf_frame()
+    
+    now = datetime.now()
+    if date_filter == "Today": 
+        pdf_df = pdf_df[pdf_df["last_modified"].dt.date == now.date()]
+    elif date_filter == "Last 7 Days": 
+        pdf_df = pdf_df[pdf_df["last_modified"] >= now - pd.Timedelta(days=7)]
+    elif date_filter == "Last 30 Days": 
+        pdf_df = pdf_df[pdf_df["last_modified"] >= now - pd.Timedelta(days=30)]
+    elif date_filter == "Last 5 Reports": 
+        pdf_df = pdf_df.head(5)
+    
+    # Display columns are formatted once here, vectorized, rather than per card on every rerun
+    return pdf_df.assign(
+        mod_time=pdf_df["last_modified"].dt.strftime("%b %d, %Y %I:%M %p"),
+        size_label=(pdf_df["file_size"] / 1024).round(1).astype(str) + " KB"
+    )
 
-@st.cache_data(ttl=60)
-def get_report_count():
-    """Get current count of PDF reports"""
-    headers = {
-        "Authorization": f"Bearer {DATABRICKS_TOKEN}",
-        "Accept": "application/json"
-    }
-    
-    url = f"{DATABRICKS_INSTANCE}/api/2.0/fs/directories{VOLUME_PATH}"
-    
+def reset_report_page():
+    """Go back to the first page when the filter or page size changes"""
+    st.session_state.report_page = 0
+
+def change_report_page(delta):
+    st.session_state.report_page += delta
+
+def export_filtered_reports(pdf_df, export_key):
+    """Build a ZIP of every filtered report, showing progress as files are added"""
+    total_mb = pdf_df["file_size"].sum() / (1024 * 1024)
+    if total_mb > REPORT_EXPORT_MAX_MB:
+        st.error(f"❌ The filtered reports add up to {total_mb:.0f} MB; exports are limited to "
+                 f"{REPORT_EXPORT_MAX_MB} MB. Narrow the date filter and try again.")
+        return
+    
+    reports = [
+        {'path': path, 'name': name, 'last_modified': last_modified, 'file_size': file_size}
+        for path, name, last_modified, file_size in zip(
+            pdf_df["path"], pdf_df["name"], pdf_df["last_modified"].astype("int64"), pdf_df["file_size"]
+        )
+    ]
+    progress_bar = st.progress(0.0, text="📦 Preparing archive...")
+    
+    def on_progress(done, total, name):
+        progress_bar.progress(done / total, text=f"📦 {done}/{total} • {name}")
+    
+    zip_path = build_reports_zip(get_databricks_client(), get_report_cache(), reports, REPORT_EXPORT_DIR,
+                                 progress=on_progress)
+    progress_bar.empty()
+    
+    # Only keep one archive per session on disk
+    previous = st.session_state.bulk_export
+    if previous and os.path.exists(previous['path']):
+        os.remove(previous['path'])
+    st.session_state.bulk_export = {'key': export_key, 'path': zip_path}
+
+def read_export_archive(zip_path):
+    """Bytes of a built archive, read when its download is requested"""
+    with open(zip_path, "rb") as zip_file:
+        return zip_file.read()
+
+def resolve_report_path(job_status):
+    """PDF a successfully finished run wrote, or None if the notebook did not report it
+
+    Guessing from the newest files in the volume could hand one user's PDF
+    to another user's run, so only the notebook's own output is trusted.
+    """
+    output_path = job_status.get('output_path')
+    return volume_report_path(output_path) if output_path else None
+
+@st.cache_resource
+def get_report_cache():
+    """Process-wide on-disk PDF cache shared by all sessions"""
+    return ReportCache(REPORT_CACHE_DIR, REPORT_CACHE_MAX_MB * 1024 * 1024)
+
+def fetch_report_bytes(file_path, last_modified, file_size):
+    """Get a PDF report from the local cache, downloading it on a miss"""
+    def download():
+        response = get_databricks_client().get(f"/api/2.0/fs/files{file_path}", endpoint='fs_file')
+        response.raise_for_status()
+        return response.content
+    
+    return get_report_cache().get_or_fetch(file_path, last_modified, file_size, download)
+
+def find_reusable_report(query):
+    """Listing row of a report recently generated for the same request, if it still exists"""
+    result = get_submission_queue().find_result(query)
+    if result is None:
+        return None
+    snapshot = get_volume_snapshot()
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            files = response.json().get("contents", [])
-            df = pd.DataFrame(files)
-            if not df.empty:
-                pdf_count = len(df[~df["is_directory"] & df["name"].str.endswith(".pdf")])
-                return pdf_count
-    except:
-        pass
-    
-    return 0
+        snapshot.refresh()
+    except requests.exceptions.RequestException:
+        return None
+    pdf_df = snapshot.pdf_frame()
+    match = pdf_df[pdf_df["path"] == result['path']]
+    if match.empty:
+        return None
+    return {**result, **match.iloc[0].to_dict()}
+
+def parse_batch_queries(text, uploaded_file):
+    """Queries from the batch text box and an optional uploaded list, duplicates removed"""
+    lines = text.splitlines()
+    if uploaded_file is not None:
+        content = uploaded_file.getvalue().decode("utf-8", errors="replace")
+        if uploaded_file.name.lower().endswith(".csv"):
+            # First column of each row holds the query
+            lines += [row[0] for row in csv.reader(io.StringIO(content)) if row]
+        else:
+            lines += content.splitlines()
+    
+    queries, seen = [], set()
+    for line in lines:
+        query = line.strip()
+        if query and normalize_text(query) not in seen:
+            seen.add(normalize_text(query))
+            queries.append(query)
+    return queries
+
+def summarize_batch_tasks(job, job_status):
+    """(finished, failed, total) task counts of a batch run"""
+    tasks = (job_status or {}).get('tasks') or {}
+    finished = sum(1 for task in tasks.values() if task['is_terminal'])
+    failed = sum(1 for task in tasks.values() if task['is_terminal'] and task['result_state'] != 'SUCCESS')
+    return finished, failed, len(job['batch'])
+
+def prepare_report(file_path):
+    """Mark a report for download, keeping only the most recent requests"""
+    prepared = [p for p in st.session_state.prepared_reports if p != file_path]
+    prepared.append(file_path)
+    st.session_state.prepared_reports = prepared[-REPORT_BYTES_CACHE_ENTRIES:]
 
 # ==========================================================
 # HEADER
@@ -487,115 +641,218 @@ with col2:
         key="run_btn"
     )
 
+with st.expander("📚 Batch mode - generate several reports in one run"):
+    batch_text = st.text_area(
+        "One query per line",
+        placeholder="violation report\nBU Analysis report",
+        key="batch_queries"
+    )
+    batch_file = st.file_uploader("...or upload a list (.txt or .csv, one query per line)", type=["txt", "csv"], key="batch_file")
+    batch_btn = st.button("Generate batch", key="batch_btn")
+
 # JOB SUBMISSION & MONITORING LOGIC
+if batch_btn:
+    batch_queries = parse_batch_queries(batch_text, batch_file)
+    if not batch_queries:
+        st.warning("⚠️ Please enter or upload at least one query.")
+    elif len(batch_queries) > BATCH_MAX_QUERIES:
+        st.warning(f"⚠️ A batch can hold at most {BATCH_MAX_QUERIES} queries ({len(batch_queries)} given).")
+    elif not all([DATABRICKS_TOKEN, DATABRICKS_INSTANCE, CLUSTER_ID, NOTEBOOK_PATH]):
+        st.error("🔧 Configuration Error: Please check your Databricks settings.")
+    else:
+        # One multi-task run for the whole batch instead of a runs/submit per query
+        submission_queue = get_submission_queue()
+        if not any(j.get('batch') and job_key(None, j['batch']) == job_key(None, batch_queries)
+                   for j in st.session_state.monitoring_jobs):
+            # Stored before queueing so the queue's submit callback always finds the row
+            job_id = str(uuid.uuid4())
+            get_job_store().add(job_id, st.session_state.queue_owner, f"Batch of {len(batch_queries)} reports",
+                                job_key(None, batch_queries), time.time(), batch=batch_queries)
+            job, deduplicated = submission_queue.enqueue_batch(st.session_state.queue_owner, batch_queries)
+            if job['run_id'] is not None:
+                get_job_store().mark_submitted(job)
+            st.session_state.monitoring_jobs.append({
+                'job_id': job_id,
+                'ticket': job['ticket'],
+                'run_id': job['run_id'],
+                'query': job['query'],
+                'start_time': job['submitted_at'] or time.time(),
+                'batch': batch_queries
+            })
+        st.success(f"✅ Batch of {len(batch_queries)} reports queued!")
+        time.sleep(1)
+        st.rerun()
+
 if run_btn:
     if not report_query.strip():
         st.warning("⚠️ Please enter a query to generate a report.")
     elif not all([DATABRICKS_TOKEN, DATABRICKS_INSTANCE, CLUSTER_ID, NOTEBOOK_PATH]):
         st.error("🔧 Configuration Error: Please check your Databricks settings.")
     # Prevent duplicate submissions
-    elif any(job['query'] == report_query for job in st.session_state.monitoring_jobs):
+    elif any(normalize_text(job['query']) == normalize_text(report_query) for job in st.session_state.monitoring_jobs):
         st.warning(f"⚠️ A job for '{report_query}' is already running. Please wait for it to complete.")
     else:
-        headers = {
-            "Authorization": f"Bearer {DATABRICKS_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "run_name": f"ai_report_{int(time.time())}",
-            "existing_cluster_id": CLUSTER_ID,
-            "notebook_task": {
-                "notebook_path": NOTEBOOK_PATH,
-                "base_parameters": {"user_question": report_query}
-            }
-        }
-        
-        submit_url = f"{DATABRICKS_INSTANCE}/api/2.1/jobs/runs/submit"
-        
-        with st.spinner("🔄 Submitting job to Databricks..."):
+        reusable = find_reusable_report(report_query)
+        if reusable is not None:
+            # Same request answered a few minutes ago: hand out that PDF instead of a new run
+            age_minutes = int((time.time() - reusable['completed_at']) // 60)
+            st.session_state.new_reports.add(reusable['path'])
+            st.success(f"✅ This report was generated {age_minutes}m ago (Run ID: `{reusable['run_id']}`) - no new run needed.")
             try:
-                res = requests.post(submit_url, headers=headers, data=json.dumps(payload), timeout=30)
-                
-                if res.status_code == 200:
-                    run_id = res.json().get("run_id")
-                    st.session_state.monitoring_jobs.append({
-                        'run_id': run_id,
-                        'query': report_query,
-                        'start_time': time.time(),
-                        'initial_count': get_report_count()
-                    })
-                    st.success(f"✅ Job submitted successfully! Run ID: `{run_id}`")
-                    st.info("💡 You can submit more queries while this one processes.")
-                    time.sleep(1)
-                    st.rerun()
-                else:
-                    st.error(f"❌ Failed to start job: {res.status_code} - {res.text}")
-            except requests.exceptions.RequestException as e:
-                st.error(f"❌ Connection Error: {str(e)}")
+                pdf_bytes = fetch_report_bytes(reusable['path'], reusable['last_modified'].value, reusable['file_size'])
+                st.download_button(label=f"⬇️ Download {reusable['name']}", data=pdf_bytes, file_name=reusable['name'],
+                                   mime="application/pdf", key="reused_report_download")
+            except requests.exceptions.RequestException:
+                st.error("Failed to fetch file")
+        else:
+            # The shared queue submits the run once a cluster slot is free; an identical
+            # request from another session is followed instead of being run twice
+            # Stored before queueing so the queue's submit callback always finds the row
+            job_id = str(uuid.uuid4())
+            get_job_store().add(job_id, st.session_state.queue_owner, report_query, job_key(report_query), time.time())
+            job, deduplicated = get_submission_queue().enqueue(st.session_state.queue_owner, report_query)
+            if job['run_id'] is not None:
+                get_job_store().mark_submitted(job)
+            st.session_state.monitoring_jobs.append({
+                'job_id': job_id,
+                'ticket': job['ticket'],
+                'run_id': job['run_id'],
+                'query': report_query,
+                'start_time': job['submitted_at'] or time.time()
+            })
+            if deduplicated:
+                st.success("✅ The same report is already being generated - you'll get it when that run finishes.")
+            else:
+                st.success("✅ Report request queued!")
+            st.info("💡 You can submit more queries while this one processes.")
+            time.sleep(1)
+            st.rerun()
 
-# Job monitoring display - USING PLACEHOLDER TO UPDATE IN-PLACE
-if st.session_state.monitoring_jobs:
-    # Create section header once
-    st.markdown("---")
-    st.markdown("### 🔄 Active Jobs")
-    
-    # Create or use existing placeholder
-    if st.session_state.jobs_placeholder is None:
-        st.session_state.jobs_placeholder = st.empty()
+# Job monitoring display - refreshed as a fragment so only this panel reruns
+@st.fragment(run_every=JOBS_PANEL_REFRESH_SECONDS)
+def render_active_jobs():
+    """Render the Active Jobs panel from the shared poller's status table"""
+    # The timer keeps firing until the next full rerun; stay cheap once empty
+    if not st.session_state.monitoring_jobs:
+        return
+    
+    poller = get_job_poller()
+    submission_queue = get_submission_queue()
+    job_store = get_job_store()
     
     # Check statuses
     jobs_to_remove = []
     
     for idx, job in enumerate(st.session_state.monitoring_jobs):
+        if job['run_id'] is None:
+            queued = submission_queue.get(job['ticket'])
+            if queued is None or queued['state'] == FAILED:
+                jobs_to_remove.append(idx)
+                error = queued['error'] if queued else "dropped from the queue"
+                st.toast(f"❌ Failed to start job: {job['query']} - {error}")
+                job_store.finish(job['job_id'], FAILED_STATUS)
+                continue
+            if queued['run_id'] is None:
+                continue
+            job['run_id'] = queued['run_id']
+            job['start_time'] = queued['submitted_at']
+        
         run_id = job['run_id']
-        job_status = check_job_status(run_id)
-        current_report_count = get_report_count()
-        elapsed_time = int(time.time() - job['start_time'])
+        job_status = poller.get_status(run_id)
+        if job_status is None:
+            # Poller restarted or run submitted elsewhere - start tracking it
+            poller.track(run_id, job['start_time'], tasks='batch' in job)
+            continue
+        if not job_status['is_terminal']:
+            continue
         
-        if current_report_count > job['initial_count'] or (job_status and job_status['is_terminal'] and job_status['result_state'] == 'SUCCESS'):
-            if current_report_count > job['initial_count'] or elapsed_time > 300:
-                jobs_to_remove.append(idx)
-                if run_id not in st.session_state.completed_jobs:
-                    st.session_state.completed_jobs.append(run_id)
-                    st.success(f"✅ Report generated for: {job['query']}")
-
-        elif job_status and job_status['is_terminal'] and job_status['result_state'] != 'SUCCESS':
-            jobs_to_remove.append(idx)
-            st.error(f"❌ Job failed: {job['query']} - {job_status['result_state']}")
-    
-    # Remove completed jobs
-    for idx in sorted(jobs_to_remove, reverse=True):
-        st.session_state.monitoring_jobs.pop(idx)
-    
-    # Update placeholder with current active jobs
-    if st.session_state.monitoring_jobs:
-        with st.session_state.jobs_placeholder.container():
-            for job in st.session_state.monitoring_jobs:
-                elapsed_time = int(time.time() - job['start_time'])
-                minutes, seconds = divmod(elapsed_time, 60)
-                col1, col2 = st.columns([6, 1])
-                with col1:
-                    st.markdown(f"""
-                    <div class="progress-box">
-                        <div class="progress-icon">⚙️</div>
-                        <div class="progress-content">
-                            <div class="progress-text">{job['query']}</div>
-                            <div class="progress-subtext">Run ID: {job['run_id']} • {minutes}m {seconds}s elapsed</div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col2:
-                    st.write("")
-                    if st.button("Cancel", key=f"cancel_{job['run_id']}", use_container_width=True):
-                        st.session_state.monitoring_jobs = [j for j in st.session_state.monitoring_jobs if j['run_id'] != job['run_id']]
-                        st.session_state.jobs_placeholder = None
-                        st.rerun()
-        time.sleep(5)
-        st.rerun()
-    else:
-        # Clear placeholder when no jobs
-        st.session_state.jobs_placeholder = None
+        # Completion is keyed on the run itself, not on the volume file count
+        jobs_to_remove.append(idx)
+        outputs = {}
+        if 'batch' in job:
+            # Each task reports its own PDF; failed tasks simply have none
+            outputs = collect_run_outputs(run_id, job_status, job['batch'])
+            st.session_state.completed_jobs.update(outputs)
+            st.toast(f"{'✅' if len(outputs) == len(job['batch']) else '⚠️'} Batch finished: "
+                     f"{len(outputs)} of {len(job['batch'])} reports generated")
+        elif job_status['result_state'] == 'SUCCESS':
+            if run_id not in st.session_state.completed_jobs:
+                report_path = resolve_report_path(job_status)
+                st.session_state.completed_jobs[run_id] = report_path
+                if report_path:
+                    st.toast(f"✅ Report generated for: {job['query']}")
+                else:
+                    st.toast(f"⚠️ Report generated for: {job['query']} - output unknown, "
+                             "look for it in the reports list")
+            if st.session_state.completed_jobs[run_id]:
+                outputs = {run_id: st.session_state.completed_jobs[run_id]}
+        else:
+            st.toast(f"❌ Job failed: {job['query']} - {job_status['result_state']}")
+        job_store.finish(job['job_id'], job_status['result_state'] or job_status['life_cycle_state'], outputs)
+    
+    # Remove finished jobs; only then rerun the whole page so the reports list updates
+    if jobs_to_remove:
+        for idx in sorted(jobs_to_remove, reverse=True):
+            st.session_state.monitoring_jobs.pop(idx)
+        try:
+            get_volume_snapshot().refresh(force=True)
+        except requests.exceptions.RequestException:
+            pass
+        st.rerun(scope="app")
+    
+    st.markdown("---")
+    st.markdown("### 🔄 Active Jobs")
+    
+    poll_metrics = poller.metrics()
+    st.caption(f"Jobs API: {poll_metrics['calls_per_minute']:.0f} calls/min • "
+               f"{poll_metrics['calls_per_minute_per_run']:.1f} per active run")
+    
+    queue_stats = submission_queue.stats()
+    for job in st.session_state.monitoring_jobs:
+        elapsed_time = int(time.time() - job['start_time'])
+        minutes, seconds = divmod(elapsed_time, 60)
+        batch_progress = None
+        job_status = poller.get_status(job['run_id']) if job['run_id'] is not None else None
+        if job_status is not None:
+            poll_info = f" • checked {job_status['polls']}× (every ~{job_status['poll_interval']:.0f}s)"
+        else:
+            poll_info = ""
+        if job['run_id'] is not None and 'batch' in job:
+            finished, failed, total = summarize_batch_tasks(job, job_status)
+            batch_progress = (finished / total, f"{finished} of {total} reports done" + (f" • {failed} failed" if failed else ""))
+            icon, subtext = "📚", f"Run ID: {job['run_id']} • {minutes}m {seconds}s elapsed{poll_info}"
+        elif job['run_id'] is not None:
+            icon, subtext = "⚙️", f"Run ID: {job['run_id']} • {minutes}m {seconds}s elapsed{poll_info}"
+        else:
+            position = submission_queue.position(job['ticket'])
+            if position is None:
+                icon, subtext = "🚀", "Submitting to Databricks..."
+            else:
+                icon, subtext = "⏳", (f"Queued • position {position} of {queue_stats['queued']} • "
+                                      f"{queue_stats['running']} running • waiting {minutes}m {seconds}s")
+        col1, col2 = st.columns([6, 1])
+        with col1:
+            st.markdown(f"""
+            <div class="progress-box">
+                <div class="progress-icon">{icon}</div>
+                <div class="progress-content">
+                    <div class="progress-text">{html.escape(job['query'])}</div>
+                    <div class="progress-subtext">{subtext}</div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            if batch_progress is not None:
+                st.progress(*batch_progress)
+        with col2:
+            st.write("")
+            if st.button("Cancel", key=f"cancel_{job['job_id']}", use_container_width=True):
+                submission_queue.cancel(st.session_state.queue_owner, job['ticket'])
+                job_store.remove(st.session_state.queue_owner, job['job_id'])
+                st.session_state.monitoring_jobs = [j for j in st.session_state.monitoring_jobs if j['job_id'] != job['job_id']]
+                st.rerun(scope="fragment")
+
+if st.session_state.monitoring_jobs:
+    render_active_jobs()
 
 # REPORTS SECTION
 col_header, col_filter = st.columns([3, 1])
@@ -607,91 +864,129 @@ with col_filter:
         "🔍 Filter",
         ["Last 5 Reports", "Today", "Last 7 Days", "Last 30 Days", "All Reports"],
         label_visibility="collapsed",
-        key="report_filter"
+        key="report_filter",
+        on_change=reset_report_page
     )
 
 if not all([DATABRICKS_TOKEN, DATABRICKS_INSTANCE, VOLUME_PATH]):
     st.warning("🔧 Please configure Databricks credentials to view reports.")
 else:
-    headers = {"Authorization": f"Bearer {DATABRICKS_TOKEN}", "Accept": "application/json"}
-    url = f"{DATABRICKS_INSTANCE}/api/2.0/fs/directories{VOLUME_PATH}"
-    
     try:
+        snapshot = get_volume_snapshot()
         with st.spinner("📥 Loading reports..."):
-            response = requests.get(url, headers=headers, timeout=60)
+            snapshot.refresh()
+        
+        # Highlight reports that appeared since this session last looked
+        if st.session_state.listing_version is not None:
+            st.session_state.new_reports.update(snapshot.changes_since(st.session_state.listing_version))
+        st.session_state.listing_version = snapshot.version
         
-        if response.status_code == 200:
-            files = response.json().get("contents", [])
+        if len(snapshot) == 0:
+            st.markdown("""<div class="empty-state"><div class="empty-state-icon">📭</div><h3>No Reports Yet</h3><p>Generate your first report using the form above</p></div>""", unsafe_allow_html=True)
+        else:
+            pdf_df = filter_reports(snapshot.version, date_filter)
+            
+            total_reports = len(pdf_df)
+            total_size_mb = round(pdf_df["file_size"].sum() / (1024 * 1024), 2) if not pdf_df.empty else 0
+            
+            col1, col2, col3 = st.columns(3)
+            with col1: 
+                st.markdown(f"""<div class="stat-card"><div class="stat-value">{total_reports}</div><div class="stat-label">Total Reports</div></div>""", unsafe_allow_html=True)
+            with col2: 
+                st.markdown(f"""<div class="stat-card"><div class="stat-value">{total_size_mb}</div><div class="stat-label">Total Size (MB)</div></div>""", unsafe_allow_html=True)
+            with col3:
+                latest = pdf_df.iloc[0]["last_modified"].strftime("%b %d") if not pdf_df.empty else "N/A"
+                st.markdown(f"""<div class="stat-card"><div class="stat-value">{latest}</div><div class="stat-label">Latest Report</div></div>""", unsafe_allow_html=True)
             
-            if not files:
-                st.markdown("""<div class="empty-state"><div class="empty-state-icon">📭</div><h3>No Reports Yet</h3><p>Generate your first report using the form above</p></div>""", unsafe_allow_html=True)
+            st.write("")
+            
+            if pdf_df.empty:
+                st.info("📄 No reports match the selected filter.")
             else:
-                df = pd.DataFrame(files)
-                df["last_modified"] = pd.to_datetime(df["last_modified"], unit="ms")
-                pdf_df = df[(~df["is_directory"]) & (df["name"].str.endswith(".pdf"))].sort_values("last_modified", ascending=False)
+                # Bulk ZIP export of everything matching the current filter
+                export_key = (snapshot.version, date_filter)
+                col_export, col_export_dl = st.columns([5, 1], vertical_alignment="bottom")
+                with col_export:
+                    if st.button(f"📦 Download all ({total_reports} filtered)", key="bulk_export_btn"):
+                        try:
+                            export_filtered_reports(pdf_df, export_key)
+                        except requests.exceptions.RequestException as e:
+                            st.error(f"❌ Failed to build archive: {str(e)}")
+                bulk_export = st.session_state.bulk_export
+                if bulk_export and bulk_export['key'] == export_key and os.path.exists(bulk_export['path']):
+                    with col_export_dl:
+                        # Deferred: the archive is only read when the button is clicked, not on every rerun
+                        archive_path = bulk_export['path']
+                        file_label = date_filter.lower().replace(" ", "_")
+                        st.download_button(label="⬇️ ZIP", data=lambda: read_export_archive(archive_path),
+                                           file_name=f"reports_{file_label}.zip", mime="application/zip",
+                                           key="bulk_export_download", use_container_width=True)
                 
-                now = datetime.now()
-                if date_filter == "Today": 
-                    pdf_df = pdf_df[pdf_df["last_modified"].dt.date == now.date()]
-                elif date_filter == "Last 7 Days": 
-                    pdf_df = pdf_df[pdf_df["last_modified"] >= now - pd.Timedelta(days=7)]
-                elif date_filter == "Last 30 Days": 
-                    pdf_df = pdf_df[pdf_df["last_modified"] >= now - pd.Timedelta(days=30)]
-                elif date_filter == "Last 5 Reports": 
-                    pdf_df = pdf_df.head(5)
+                # Only the visible slice of the filtered listing becomes widgets
+                page_size = st.session_state.get("report_page_size", REPORT_PAGE_SIZES[0])
+                total_pages = max(1, -(-total_reports // page_size))
+                st.session_state.report_page = min(st.session_state.report_page, total_pages - 1)
+                page_start = st.session_state.report_page * page_size
+                page_df = pdf_df.iloc[page_start:page_start + page_size]
                 
-                total_reports = len(pdf_df)
-                total_size_mb = round(pdf_df["file_size"].sum() / (1024 * 1024), 2) if not pdf_df.empty else 0
+                # One markdown block for every card on the page instead of a widget row per report
+                new_report_paths = st.session_state.new_reports | set(st.session_state.completed_jobs.values())
+                is_new = page_df["path"].isin(new_report_paths) | (page_df["last_modified"] >= pd.Timestamp(datetime.now()) - pd.Timedelta(seconds=30))
+                cards_html = "".join(
+                    f"""<div class="{'report-card new-report' if new else 'report-card'}">"""
+                    f"""<div class="report-name">{'🆕 ' if new else ''}📄 {html.escape(name)}</div>"""
+                    f"""<div class="report-meta"><div class="report-meta-item">🕒 {mod_time}</div><div class="report-meta-item">💾 {size_label}</div></div>"""
+                    f"""</div>"""
+                    for name, mod_time, size_label, new in zip(page_df["name"], page_df["mod_time"], page_df["size_label"], is_new)
+                )
+                st.markdown(cards_html, unsafe_allow_html=True)
                 
-                col1, col2, col3 = st.columns(3)
-                with col1: 
-                    st.markdown(f"""<div class="stat-card"><div class="stat-value">{total_reports}</div><div class="stat-label">Total Reports</div></div>""", unsafe_allow_html=True)
-                with col2: 
-                    st.markdown(f"""<div class="stat-card"><div class="stat-value">{total_size_mb}</div><div class="stat-label">Total Size (MB)</div></div>""", unsafe_allow_html=True)
-                with col3:
-                    latest = pdf_df.iloc[0]["last_modified"].strftime("%b %d") if not pdf_df.empty else "N/A"
-                    st.markdown(f"""<div class="stat-card"><div class="stat-value">{latest}</div><div class="stat-label">Latest Report</div></div>""", unsafe_allow_html=True)
+                # Single download control for the page; bytes are only pulled once requested
+                report_names = dict(zip(page_df["path"], page_df["name"]))
+                col_pick, col_action = st.columns([5, 1], vertical_alignment="bottom")
+                with col_pick:
+                    file_path = st.selectbox("⬇️ Download a report", list(report_names), format_func=report_names.get, key="report_download_pick")
+                with col_action:
+                    if file_path not in st.session_state.prepared_reports:
+                        st.button("📥 Fetch", key="report_fetch", on_click=prepare_report, args=(file_path,), use_container_width=True)
+                    else:
+                        row = page_df[page_df["path"] == file_path].iloc[0]
+                        try:
+                            pdf_bytes = fetch_report_bytes(file_path, row["last_modified"].value, row["file_size"])
+                            st.download_button(label="⬇️ Download", data=pdf_bytes, file_name=row["name"], mime="application/pdf", key="report_download", use_container_width=True)
+                        except requests.exceptions.HTTPError as e:
+                            st.error(f"Error: {e.response.status_code}")
+                        except requests.exceptions.RequestException as e: 
+                            st.error(f"Failed to fetch file")
                 
-                st.write("")
+                col_prev, col_info, col_size, col_next = st.columns([1, 3, 1, 1], vertical_alignment="center")
+                with col_prev:
+                    st.button("◀ Previous", key="report_page_prev", on_click=change_report_page, args=(-1,),
+                              disabled=st.session_state.report_page == 0, use_container_width=True)
+                with col_info:
+                    st.markdown(
+                        f"<div style='text-align: center;'>Page {st.session_state.report_page + 1} of {total_pages} • "
+                        f"{page_start + 1}–{page_start + len(page_df)} of {total_reports} reports</div>",
+                        unsafe_allow_html=True
+                    )
+                with col_size:
+                    st.selectbox("Per page", REPORT_PAGE_SIZES, key="report_page_size",
+                                 on_change=reset_report_page, label_visibility="collapsed")
+                with col_next:
+                    st.button("Next ▶", key="report_page_next", on_click=change_report_page, args=(1,),
+                              disabled=st.session_state.report_page >= total_pages - 1, use_container_width=True)
                 
-                if pdf_df.empty:
-                    st.info("📄 No reports match the selected filter.")
-                else:
-                    for idx, row in pdf_df.iterrows():
-                        file_name, file_path = row["name"], row["path"]
-                        size_kb = round(row["file_size"] / 1024, 1)
-                        mod_time = row["last_modified"].strftime("%b %d, %Y %I:%M %p")
-                        is_new = (datetime.now() - row["last_modified"]).total_seconds() < 30
-                        
-                        col1, col2 = st.columns([5, 1])
-                        with col1:
-                            card_class = "report-card new-report" if is_new else "report-card"
-                            new_badge = "🆕 " if is_new else ""
-                            st.markdown(f"""
-                            <div class="{card_class}">
-                                <div class="report-name">{new_badge}📄 {file_name}</div>
-                                <div class="report-meta"><div class="report-meta-item">🕒 {mod_time}</div><div class="report-meta-item">💾 {size_kb} KB</div></div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col2:
-                            file_api_url = f"{DATABRICKS_INSTANCE}/api/2.0/fs/files{file_path}"
-                            try:
-                                file_res = requests.get(file_api_url, headers=headers, timeout=60) 
-                                if file_res.status_code == 200:
-                                    pdf_bytes = file_res.content
-                                    st.write("")
-                                    st.download_button(label="⬇️ Download", data=pdf_bytes, file_name=file_name, mime="application/pdf", key=f"download_{file_name}_{idx}")
-                                else: 
-                                    st.error(f"Error: {file_res.status_code}")
-                            except requests.exceptions.RequestException as e: 
-                                st.error(f"Failed to fetch file")
-        
-        elif response.status_code == 404: 
+                cache_stats = get_report_cache().stats()
+                st.caption(
+                    f"💾 Local PDF cache: {cache_stats['hits']} hits • {cache_stats['misses']} misses • "
+                    f"{round(cache_stats['bytes'] / (1024 * 1024), 1)} / {REPORT_CACHE_MAX_MB} MB"
+                )
+    
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 404:
             st.warning("📁 Volume path not found. Please verify your VOLUME_PATH configuration.")
-        else: 
-            st.error(f"❌ Error listing files: {response.status_code} - {response.text}")
-    
+        else:
+            st.error(f"❌ Error listing files: {e.response.status_code} - {e.response.text}")
     except requests.exceptions.RequestException as e: 
         st.error(f"❌ Connection Error: Unable to connect to Databricks. {str(e)}")
 
@@ -1,10 +1,15 @@
 import streamlit as st
-import requests
-import json
 from datetime import datetime
 import uuid
-import sqlite3
+from collections import OrderedDict
 from contextlib import contextmanager
+from databricks_client import get_databricks_client
+from response_stream import iter_response_text, NO_RESPONSE_TEXT, OUTPUT_SEPARATOR
+from chat_context import build_context, build_summary_request, select_context_start
+from response_cache import ResponseCache
+from chat_worker import get_chat_worker_pool
+from sqlite_db import get_pool, get_writer, migrate, add_column
+from user_identity import get_user_id
 
 # ==========================================================
 # PAGE CONFIG
@@ -26,88 +31,152 @@ VOLUME_PATH = st.secrets.get('VOLUME_PATH')
 CLUSTER_ID = st.secrets.get('CLUSTER_ID')
 CHATBOT_ENDPOINT = st.secrets.get('CHATBOT_ENDPOINT')
 
+# Stream tokens from the serving endpoint as they are generated
+CHAT_STREAMING = str(st.secrets.get('CHAT_STREAMING', True)).lower() == 'true'
+
+# Read size when parsing non-streamed replies
+RESPONSE_CHUNK_BYTES = 64 * 1024
+
+# Context budget sent to the model on each turn
+CHAT_CONTEXT_MAX_TURNS = int(st.secrets.get('CHAT_CONTEXT_MAX_TURNS', 10))
+CHAT_CONTEXT_MAX_TOKENS = int(st.secrets.get('CHAT_CONTEXT_MAX_TOKENS', 6000))
+
+# Fold turns that fall out of the window into a rolling summary (one extra model call per batch)
+CHAT_SUMMARIZE = str(st.secrets.get('CHAT_SUMMARIZE', False)).lower() == 'true'
+CHAT_SUMMARY_BATCH_MESSAGES = int(st.secrets.get('CHAT_SUMMARY_BATCH_MESSAGES', 6))
+
+# Opt-in cache of replies for repeated questions
+CHAT_RESPONSE_CACHE = str(st.secrets.get('CHAT_RESPONSE_CACHE', False)).lower() == 'true'
+CHAT_CACHE_TTL_SECONDS = int(st.secrets.get('CHAT_CACHE_TTL_SECONDS', 3600))
+CHAT_CACHE_MAX_ENTRIES = int(st.secrets.get('CHAT_CACHE_MAX_ENTRIES', 500))
+
+# Conversations whose messages stay loaded in a session
+CHAT_LOADED_LIMIT = int(st.secrets.get('CHAT_LOADED_LIMIT', 10))
+
+# How often the page checks a background chatbot request for new text (seconds)
+CHAT_POLL_SECONDS = float(st.secrets.get('CHAT_POLL_SECONDS', 0.5))
+
 # SQLite database file
 DB_FILE = "chat_history.db"
 
+# Owner (signed-in email) who inherits chats saved before history was
+# partitioned per user. Applied once, when the database is migrated; if it
+# is unset then, those chats stay unowned and hidden
+CHAT_LEGACY_OWNER = st.secrets.get('CHAT_LEGACY_OWNER')
+
 # ==========================================================
 # DATABASE FUNCTIONS
 # ==========================================================
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    try:
+    """Context manager for database connections (borrowed from a shared WAL-mode pool)"""
+    with get_pool(DB_FILE).connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
+def _create_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            is_current INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (chat_id) REFERENCES chats (chat_id) ON DELETE CASCADE
+        )
+    """)
+
+def _add_response_cache(conn):
+    # Cached chatbot replies keyed on a hash of the normalized context
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS response_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    """)
+
+def _add_chat_summary(conn):
+    # Rolling summary of turns that fell out of the context window
+    add_column(conn, "chats", "summary", "TEXT")
+    add_column(conn, "chats", "summary_upto", "INTEGER DEFAULT 0")
+
+def _add_chat_owner(conn):
+    # Chats are partitioned per user; startup reads one owner's slice
+    add_column(conn, "chats", "owner", "TEXT")
+
+def _add_indexes(conn):
+    # Messages are always read per chat in message_id order
+    conn.execute("DROP INDEX IF EXISTS idx_messages_chat_id")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_message ON messages(chat_id, message_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chats_owner_created ON chats(owner, created_at)")
+    # LRU eviction scans the cache by recency
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache(last_used)")
+
+def _claim_legacy_chats(conn):
+    # Chats from before the owner column have owner NULL
+    if CHAT_LEGACY_OWNER:
+        conn.execute("UPDATE chats SET owner = ? WHERE owner IS NULL", (CHAT_LEGACY_OWNER,))
+
+# Append only; a database at PRAGMA user_version N has the first N applied.
+# The early steps are idempotent so databases created before versioning
+# (user_version 0) migrate cleanly.
+CHAT_MIGRATIONS = [
+    _create_base_tables,
+    _add_response_cache,
+    _add_chat_summary,
+    _add_chat_owner,
+    _add_indexes,
+    _claim_legacy_chats,
+]
+
+@st.cache_resource
 def init_database():
-    """Initialize SQLite database with required tables"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Create chats table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chats (
-                chat_id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                is_current INTEGER DEFAULT 0
-            )
-        """)
-        
-        # Create messages table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (chat_id) REFERENCES chats (chat_id) ON DELETE CASCADE
-            )
-        """)
-        
-        # Create index for faster queries
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_messages_chat_id 
-            ON messages(chat_id)
-        """)
-        
-        conn.commit()
-
-def save_chat_to_db(chat_id, title, created_at, is_current=False):
-    """Save or update a chat in the database"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # If this is the current chat, unset all others
-        if is_current:
-            cursor.execute("UPDATE chats SET is_current = 0")
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO chats (chat_id, title, created_at, is_current)
-            VALUES (?, ?, ?, ?)
-        """, (chat_id, title, created_at.isoformat(), 1 if is_current else 0))
-        
-        conn.commit()
+    """Bring the SQLite schema up to date (once per process)"""
+    return migrate(get_pool(DB_FILE), CHAT_MIGRATIONS)
+
+def get_chat_writer():
+    """Write-behind queue for chat history; commits happen off the script thread"""
+    return get_writer(DB_FILE)
+
+def save_chat_to_db(owner, chat_id, title, created_at, is_current=False):
+    """Save or update one of the owner's chats in the database (queued)"""
+    # Upsert so columns not managed here (e.g. the summary) survive; only the
+    # current-chat marker below changes is_current of an existing row
+    get_chat_writer().submit([("""
+        INSERT INTO chats (chat_id, title, created_at, is_current, owner)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(chat_id) DO UPDATE SET
+            title = excluded.title,
+            created_at = excluded.created_at
+        WHERE chats.owner = excluded.owner
+    """, (chat_id, title, created_at.isoformat(), 1 if is_current else 0, owner))], key=('chat', chat_id))
+    
+    if is_current:
+        set_current_chat_db(owner, chat_id)
 
 def save_message_to_db(chat_id, role, content):
-    """Save a message to the database"""
+    """Save a message to the database (queued)"""
+    get_chat_writer().submit([("""
+        INSERT INTO messages (chat_id, role, content, created_at)
+        VALUES (?, ?, ?, ?)
+    """, (chat_id, role, content, datetime.now().isoformat()))])
+
+def load_chats_from_db(owner):
+    """Load the owner's chats from the database"""
+    get_chat_writer().flush()
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO messages (chat_id, role, content, created_at)
-            VALUES (?, ?, ?, ?)
-        """, (chat_id, role, content, datetime.now().isoformat()))
-        conn.commit()
-
-def load_chats_from_db():
-    """Load all chats from the database"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM chats ORDER BY created_at DESC")
+        cursor.execute("SELECT * FROM chats WHERE owner = ? ORDER BY created_at DESC", (owner,))
         rows = cursor.fetchall()
         
         chats = {}
@@ -118,7 +187,9 @@ def load_chats_from_db():
             chats[chat_id] = {
                 'title': row['title'],
                 'created_at': datetime.fromisoformat(row['created_at']),
-                'messages': []
+                'messages': None,  # loaded on first open
+                'summary': row['summary'],
+                'summary_upto': row['summary_upto'] or 0
             }
             
             if row['is_current']:
@@ -128,6 +199,7 @@ def load_chats_from_db():
 
 def load_messages_for_chat(chat_id):
     """Load all messages for a specific chat"""
+    get_chat_writer().flush()
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -139,52 +211,66 @@ def load_messages_for_chat(chat_id):
         
         return [{'role': row['role'], 'content': row['content']} for row in rows]
 
-def delete_chat_from_db(chat_id):
-    """Delete a chat and all its messages from the database"""
+def delete_chat_from_db(owner, chat_id):
+    """Delete one of the owner's chats and all its messages from the database"""
+    get_chat_writer().flush()
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
-        cursor.execute("DELETE FROM chats WHERE chat_id = ?", (chat_id,))
+        # Messages go with it through ON DELETE CASCADE
+        conn.execute("DELETE FROM chats WHERE chat_id = ? AND owner = ?", (chat_id, owner))
         conn.commit()
 
 def clear_chat_messages_db(chat_id):
     """Clear all messages for a specific chat"""
+    get_chat_writer().flush()
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+        cursor.execute("UPDATE chats SET summary = NULL, summary_upto = 0 WHERE chat_id = ?", (chat_id,))
         conn.commit()
 
-def clear_all_data_db():
-    """Clear all chats and messages from the database"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM messages")
-        cursor.execute("DELETE FROM chats")
-        conn.commit()
+def save_chat_summary_db(chat_id, summary, summary_upto):
+    """Store the rolling summary and how many messages it covers (queued)"""
+    get_chat_writer().submit([(
+        "UPDATE chats SET summary = ?, summary_upto = ? WHERE chat_id = ?",
+        (summary, summary_upto, chat_id)
+    )], key=('summary', chat_id))
 
-def set_current_chat_db(chat_id):
-    """Set a chat as the current active chat"""
+def clear_all_data_db(owner):
+    """Clear all of the owner's chats and messages from the database"""
+    get_chat_writer().flush()
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE chats SET is_current = 0")
-        cursor.execute("UPDATE chats SET is_current = 1 WHERE chat_id = ?", (chat_id,))
+        conn.execute("DELETE FROM chats WHERE owner = ?", (owner,))
         conn.commit()
 
+def set_current_chat_db(owner, chat_id):
+    """Set a chat as the owner's current active chat (queued)"""
+    # Only the latest switch matters; it runs after any pending chat inserts
+    # and touches just the previous and the new current row of this owner
+    get_chat_writer().submit([
+        ("UPDATE chats SET is_current = 0 WHERE owner = ? AND is_current = 1 AND chat_id != ?", (owner, chat_id)),
+        ("UPDATE chats SET is_current = 1 WHERE owner = ? AND chat_id = ?", (owner, chat_id))
+    ], key=('current', owner), move_to_end=True)
+
+@st.cache_resource
+def get_response_cache():
+    """Process-wide reply cache so hit counters are shared by all sessions"""
+    return ResponseCache(get_db_connection, CHATBOT_ENDPOINT, CHAT_CACHE_TTL_SECONDS, CHAT_CACHE_MAX_ENTRIES)
+
 # ==========================================================
 # INITIALIZE DATABASE AND SESSION STATE
 # ==========================================================
 # Initialize database
 init_database()
 
+# Chats are partitioned per user (shared with the report generator page)
+st.session_state.chat_owner = get_user_id()
+
 if 'chats' not in st.session_state:
-    # Load from database
-    loaded_chats, loaded_chat_id = load_chats_from_db()
+    # Load this user's chats from the database
+    loaded_chats, loaded_chat_id = load_chats_from_db(st.session_state.chat_owner)
     
     if loaded_chats:
-        # Load messages for each chat
-        for chat_id in loaded_chats.keys():
-            loaded_chats[chat_id]['messages'] = load_messages_for_chat(chat_id)
-        
+        # Only chat metadata is loaded here; messages are loaded per chat when opened
         st.session_state.chats = loaded_chats
         st.session_state.current_chat_id = loaded_chat_id or list(loaded_chats.keys())[0]
     else:
@@ -198,7 +284,7 @@ if 'chats' not in st.session_state:
             }
         }
         st.session_state.current_chat_id = initial_id
-        save_chat_to_db(initial_id, "New Chat", datetime.now(), is_current=True)
+        save_chat_to_db(st.session_state.chat_owner, initial_id, "New Chat", datetime.now(), is_current=True)
 
 if 'awaiting_response' not in st.session_state:
     st.session_state.awaiting_response = False
@@ -206,11 +292,41 @@ if 'awaiting_response' not in st.session_state:
 if 'editing_chat_id' not in st.session_state:
     st.session_state.editing_chat_id = None
 
+if 'chat_request' not in st.session_state:
+    st.session_state.chat_request = None
+
+if 'loaded_chat_ids' not in st.session_state:
+    st.session_state.loaded_chat_ids = OrderedDict()  # least recently opened first
+
 # ==========================================================
 # HELPER FUNCTIONS
 # ==========================================================
+def ensure_messages_loaded(chat_id):
+    """Load a chat's messages on first open, keeping a bounded LRU of loaded chats"""
+    chat = st.session_state.chats.get(chat_id)
+    if chat is None:
+        return
+    if chat["messages"] is None:
+        chat["messages"] = load_messages_for_chat(chat_id)
+    
+    loaded = st.session_state.loaded_chat_ids
+    loaded[chat_id] = True
+    loaded.move_to_end(chat_id)
+    
+    # Unload the least recently opened chats, never the one being answered
+    pending = st.session_state.chat_request
+    for old_id in list(loaded):
+        if len(loaded) <= CHAT_LOADED_LIMIT:
+            break
+        if old_id == chat_id or (pending is not None and pending.chat_id == old_id):
+            continue
+        del loaded[old_id]
+        if old_id in st.session_state.chats:
+            st.session_state.chats[old_id]["messages"] = None
+
 def get_current_chat():
     """Get the current active chat"""
+    ensure_messages_loaded(st.session_state.current_chat_id)
     return st.session_state.chats.get(st.session_state.current_chat_id, {
         "title": "New Chat",
         "messages": [],
@@ -226,34 +342,36 @@ def create_new_chat():
         "created_at": datetime.now()
     }
     st.session_state.current_chat_id = new_id
-    st.session_state.awaiting_response = False
-    save_chat_to_db(new_id, "New Chat", datetime.now(), is_current=True)
+    cancel_pending_request()
+    save_chat_to_db(st.session_state.chat_owner, new_id, "New Chat", datetime.now(), is_current=True)
 
 def delete_chat(chat_id):
     """Delete a chat session"""
     if chat_id in st.session_state.chats:
         del st.session_state.chats[chat_id]
-        delete_chat_from_db(chat_id)
+        st.session_state.loaded_chat_ids.pop(chat_id, None)
+        delete_chat_from_db(st.session_state.chat_owner, chat_id)
         
         # If deleting current chat, switch to another or create new
         if chat_id == st.session_state.current_chat_id:
             if st.session_state.chats:
                 st.session_state.current_chat_id = list(st.session_state.chats.keys())[0]
-                set_current_chat_db(st.session_state.current_chat_id)
+                set_current_chat_db(st.session_state.chat_owner, st.session_state.current_chat_id)
             else:
                 create_new_chat()
 
 def switch_chat(chat_id):
     """Switch to a different chat"""
     st.session_state.current_chat_id = chat_id
-    st.session_state.awaiting_response = False
-    set_current_chat_db(chat_id)
+    cancel_pending_request()
+    set_current_chat_db(st.session_state.chat_owner, chat_id)
 
 def update_chat_title(chat_id, first_message):
     """Auto-generate chat title from first user message"""
     title = first_message[:50] + ("..." if len(first_message) > 50 else "")
     st.session_state.chats[chat_id]["title"] = title
     save_chat_to_db(
+        st.session_state.chat_owner,
         chat_id, 
         title, 
         st.session_state.chats[chat_id]["created_at"],
@@ -265,23 +383,15 @@ def rename_chat(chat_id, new_title):
     if new_title and new_title.strip():
         st.session_state.chats[chat_id]["title"] = new_title.strip()
         save_chat_to_db(
+            st.session_state.chat_owner,
             chat_id,
             new_title.strip(),
             st.session_state.chats[chat_id]["created_at"],
             is_current=(chat_id == st.session_state.current_chat_id)
         )
 
-def chat_with_bot(conversation_history):
-    """Send full conversation history to chatbot and get response"""
-    if not all([DATABRICKS_TOKEN, CHATBOT_ENDPOINT]):
-        return "Error: Chatbot endpoint or token is not configured."
-    
-    headers = {
-        "Authorization": f"Bearer {DATABRICKS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
-    # Build input array from conversation history
+def build_chat_payload(conversation_history, stream=False):
+    """Build the serving endpoint request body from conversation history"""
     input_messages = []
     for msg in conversation_history:
         input_messages.append({
@@ -294,47 +404,185 @@ def chat_with_bot(conversation_history):
     payload = {
         "input": input_messages
     }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+def chat_with_bot(conversation_history, client=None):
+    """Send full conversation history to chatbot and get response"""
+    if not all([DATABRICKS_TOKEN, CHATBOT_ENDPOINT]):
+        return "Error: Chatbot endpoint or token is not configured."
+
+    payload = build_chat_payload(conversation_history)
+    client = client or get_databricks_client()
 
     try:
-        response = requests.post(CHATBOT_ENDPOINT, headers=headers, json=payload, timeout=300)
-        if response.status_code != 200:
-            return f"Error: {response.status_code} - {response.text}"
+        with client.post(CHATBOT_ENDPOINT, endpoint='serving', json=payload, stream=True) as response:
+            if response.status_code != 200:
+                return f"Error: {response.status_code} - {response.text}"
 
-        texts = []
-        raw = response.text.strip()
-        
-        # Handle NDJSON
-        if '\n' in raw:
-            for line in raw.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                    if data.get("type") == "response.output_item.done":
-                        item = data.get("item", {})
-                        for content in item.get("content", []):
-                            if content.get("type") == "output_text":
-                                texts.append(content.get("text", ""))
-                except json.JSONDecodeError:
-                    continue
-        else:
-            try:
-                data = json.loads(raw)
-                if isinstance(data, dict) and "output" in data:
-                    for msg in data["output"]:
-                        for content in msg.get("content", []):
-                            if content.get("type") == "output_text":
-                                texts.append(content.get("text", ""))
-            except Exception:
-                pass
-
-        result = "\n\n---\n\n".join(texts) if texts else "No response received. Check model/endpoint status."
-        return result
+            # Parse the body chunk by chunk instead of materializing it as one string
+            return "".join(iter_response_text(response.iter_content(chunk_size=RESPONSE_CHUNK_BYTES)))
 
     except Exception as e:
         return f"Error: {str(e)}"
 
+def prepare_context(chat_id, chat, client=None):
+    """Messages to send this turn, bounded by the context budget"""
+    messages = chat["messages"]
+    if not CHAT_SUMMARIZE:
+        return build_context(messages, CHAT_CONTEXT_MAX_TURNS, CHAT_CONTEXT_MAX_TOKENS)
+    
+    # Summarize in batches so the summary call is not made on every turn
+    start = select_context_start(messages, CHAT_CONTEXT_MAX_TURNS, CHAT_CONTEXT_MAX_TOKENS)
+    summary_upto = chat.get("summary_upto", 0)
+    if start - summary_upto >= CHAT_SUMMARY_BATCH_MESSAGES:
+        summary = chat_with_bot(build_summary_request(chat.get("summary"), messages[summary_upto:start]), client)
+        if not summary.startswith("Error:") and summary != NO_RESPONSE_TEXT:
+            chat["summary"], chat["summary_upto"] = summary, start
+            save_chat_summary_db(chat_id, summary, start)
+    
+    return build_context(
+        messages, CHAT_CONTEXT_MAX_TURNS, CHAT_CONTEXT_MAX_TOKENS,
+        chat.get("summary"), chat.get("summary_upto", 0), CHAT_SUMMARY_BATCH_MESSAGES
+    )
+
+class ChatStreamError(Exception):
+    """The streamed reply failed; any text already yielded is incomplete"""
+
+def stream_chat_with_bot(conversation_history, client=None):
+    """Send conversation history to chatbot and yield the reply as it is generated
+
+    Raises ChatStreamError instead of yielding error text, so callers can tell
+    a failed stream from a reply.
+    """
+    if not all([DATABRICKS_TOKEN, CHATBOT_ENDPOINT]):
+        raise ChatStreamError("Chatbot endpoint or token is not configured.")
+
+    payload = build_chat_payload(conversation_history, stream=True)
+    client = client or get_databricks_client()
+
+    try:
+        with client.post(CHATBOT_ENDPOINT, endpoint='serving', json=payload, stream=True) as response:
+            if response.status_code != 200:
+                raise ChatStreamError(f"{response.status_code} - {response.text}")
+
+            # chunk_size=None hands over bytes as soon as they arrive
+            yield from iter_response_text(response.iter_content(chunk_size=None))
+
+    except ChatStreamError:
+        raise
+    except Exception as e:
+        raise ChatStreamError(str(e)) from e
+
+def generate_reply(request, chat, use_cache, client, response_cache):
+    """Worker-thread body: build the context, then fill the request from cache or the model"""
+    context = prepare_context(request.chat_id, chat, client)
+    cached = response_cache.get(context) if use_cache else None
+    if cached is not None:
+        request.append(cached)
+        return
+    
+    failed = False
+    if CHAT_STREAMING:
+        pieces = stream_chat_with_bot(context, client)
+    else:
+        reply = chat_with_bot(context, client)
+        failed = reply.startswith("Error:")
+        pieces = (piece for piece in [reply])
+    try:
+        for piece in pieces:
+            if request.cancelled:
+                # Closing the generator closes the HTTP response
+                pieces.close()
+                return
+            request.append(piece)
+    except ChatStreamError as e:
+        failed = True
+        # Keep what already streamed in and show the error below it
+        request.append(f"{OUTPUT_SEPARATOR if request.text() else ''}Error: {e}")
+    
+    # Failed (possibly partial) and empty replies are never cached
+    bot_response = request.text()
+    if use_cache and not failed and bot_response != NO_RESPONSE_TEXT:
+        response_cache.put(context, bot_response)
+
+def submit_chat_request():
+    """Queue the reply for the current chat on the shared worker pool"""
+    chat_id = st.session_state.current_chat_id
+    use_cache = CHAT_RESPONSE_CACHE and st.session_state.get("use_response_cache", True)
+    # Resolve shared resources here; worker threads have no script context
+    client, response_cache = get_databricks_client(), get_response_cache()
+    chat = st.session_state.chats[chat_id]
+    return get_chat_worker_pool().submit(
+        st.session_state.chat_owner,
+        chat_id,
+        lambda request: run_chat_request(request, chat, use_cache, client, response_cache)
+    )
+
+def reply_text(request):
+    """Final text of a finished request, including failures"""
+    bot_response = request.text()
+    if not bot_response:
+        bot_response = f"Error: {request.error}" if request.error else NO_RESPONSE_TEXT
+    return bot_response
+
+def run_chat_request(request, chat, use_cache, client, response_cache):
+    """Worker-thread body: generate the reply and save it, even if the page has gone away"""
+    try:
+        generate_reply(request, chat, use_cache, client, response_cache)
+    except Exception as e:
+        request.error = str(e)
+    if not request.cancelled:
+        # The write-behind queue is safe to use from worker threads
+        save_message_to_db(request.chat_id, "assistant", reply_text(request))
+
+def finish_chat_request(request):
+    """Show the completed reply in its chat (the worker already saved it)"""
+    chat = st.session_state.chats.get(request.chat_id)
+    if chat is not None and chat["messages"] is not None:
+        chat["messages"].append({
+            "role": "assistant",
+            "content": reply_text(request)
+        })
+    
+    st.session_state.chat_request = None
+    st.session_state.awaiting_response = False
+
+def cancel_pending_request():
+    """Stop waiting for a reply and cancel its background call"""
+    if st.session_state.chat_request is not None:
+        st.session_state.chat_request.cancel()
+        st.session_state.chat_request = None
+    st.session_state.awaiting_response = False
+
+@st.fragment(run_every=CHAT_POLL_SECONDS)
+def render_pending_reply():
+    """Poll the background request and show its reply as it streams in"""
+    if not st.session_state.awaiting_response:
+        return
+    
+    request = st.session_state.chat_request
+    if request is None:
+        request = submit_chat_request()
+        if request is None:
+            # Per-user limit reached - try again on the next tick
+            with st.chat_message("assistant"):
+                st.info("⏳ Waiting for your other requests to finish...")
+            return
+        st.session_state.chat_request = request
+    
+    if request.done:
+        finish_chat_request(request)
+        st.rerun(scope="app")
+    
+    with st.chat_message("assistant"):
+        partial = request.text()
+        st.markdown(partial + " ▌" if partial else "_Thinking..._")
+        if st.button("⏹ Stop", key="cancel_chat_request", help="Stop generating"):
+            cancel_pending_request()
+            st.rerun(scope="app")
+
 # ==========================================================
 # SIDEBAR - CHAT HISTORY
 # ==========================================================
@@ -549,15 +797,23 @@ with st.sidebar:
         with col2:
             if st.button("✅ Confirm", use_container_width=True, type="primary", key="confirm_clear"):
                 st.session_state.chats = {}
-                clear_all_data_db()
+                st.session_state.loaded_chat_ids.clear()
+                clear_all_data_db(st.session_state.chat_owner)
                 create_new_chat()
                 st.session_state.show_confirm = False
                 st.rerun()
     
+    cache_info = ""
+    if CHAT_RESPONSE_CACHE:
+        st.toggle("⚡ Reuse cached answers", value=True, key="use_response_cache",
+                  help="Turn off to always ask the model again")
+        cache_stats = get_response_cache().stats()
+        cache_info = f"<br>⚡ Cache: {cache_stats['hits']} hits • {round(cache_stats['hit_rate'] * 100)}% hit rate"
+    
     st.markdown(f"""
     <div class="footer-info">
         📊 {len(st.session_state.chats)} chat session(s)<br>
-        💾 SQLite Auto-saved
+        💾 SQLite Auto-saved{cache_info}
     </div>
     """, unsafe_allow_html=True)
 
@@ -634,23 +890,9 @@ with chat_container:
             with st.chat_message(msg["role"]):
                 st.markdown(msg["content"])
     
-    # Show thinking indicator if processing
+    # The reply is generated on a worker thread; only this fragment polls for it
     if st.session_state.awaiting_response:
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                bot_response = chat_with_bot(current_chat["messages"])
-        
-        # Add response to current chat history
-        current_chat["messages"].append({
-            "role": "assistant",
-            "content": bot_response
-        })
-        
-        # Save to database
-        save_message_to_db(st.session_state.current_chat_id, "assistant", bot_response)
-        
-        st.session_state.awaiting_response = False
-        st.rerun()
+        render_pending_reply()
 
 # Fixed input area at bottom
 col1, col2 = st.columns([9, 1])
@@ -674,14 +916,16 @@ with col2:
     ):
         current_chat["messages"] = []
         current_chat["title"] = "New Chat"
+        current_chat["summary"], current_chat["summary_upto"] = None, 0
         clear_chat_messages_db(st.session_state.current_chat_id)
         save_chat_to_db(
+            st.session_state.chat_owner,
             st.session_state.current_chat_id,
             "New Chat",
             current_chat["created_at"],
             is_current=True
         )
-        st.session_state.awaiting_response = False
+        cancel_pending_request()
         st.rerun()
 
 # Handle message submission
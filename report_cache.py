@@ -0,0 +1,176 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+# ==========================================================
+# ON-DISK REPORT CACHE
+# ==========================================================
+# Generated reports are immutable once written, so the
+# (path, last_modified, file_size) triple from the volume
+# listing identifies the file contents.
+CACHE_SUFFIX = ".pdf"
+TEMP_SUFFIX = ".part"
+
+
+def make_cache_key(path, last_modified, file_size):
+    """Build a content-addressed cache key from volume listing metadata"""
+    raw = f"{path}|{last_modified}|{file_size}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ReportCache:
+    """Byte-budgeted LRU cache of report files stored on local disk"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _file_for(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def _load_existing(self):
+        """Index files left by a previous process, least recently used first"""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            full_path = os.path.join(self.cache_dir, name)
+            if name.endswith(TEMP_SUFFIX):
+                # Leftover from an interrupted write
+                try:
+                    os.remove(full_path)
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-len(CACHE_SUFFIX)], stat.st_size))
+
+        with self._lock:
+            for _, key, size in sorted(found):
+                self._entries[key] = size
+                self._total_bytes += size
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """Drop least recently used files until the byte budget is met"""
+        while self._entries and self._total_bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._file_for(key))
+            except OSError:
+                pass
+
+    def _forget(self, key):
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def get(self, key):
+        """Return cached bytes for key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        file_path = self._file_for(key)
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+            # Keep mtime in step with LRU order so restarts preserve it
+            os.utime(file_path)
+            return data
+        except OSError:
+            # File vanished underneath us - treat as a miss
+            self._forget(key)
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def lookup_file(self, key):
+        """Path of the cached file for key (counted as a hit), or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._file_for(key)
+
+    def put_file(self, key, source_path):
+        """Move an already downloaded file into the cache; False if it does not fit"""
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return False
+
+        shutil.move(source_path, self._file_for(key))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict_locked()
+        return True
+
+    def put(self, key, data):
+        """Store bytes under key, evicting older entries if needed"""
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        file_path = self._file_for(key)
+        temp_path = f"{file_path}.{threading.get_ident()}{TEMP_SUFFIX}"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict_locked()
+
+    def get_or_fetch(self, path, last_modified, file_size, fetch):
+        """Return report bytes from disk, calling fetch() only on a miss"""
+        key = make_cache_key(path, last_modified, file_size)
+        data = self.get(key)
+        if data is None:
+            data = fetch()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
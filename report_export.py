@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from report_cache import TEMP_SUFFIX, make_cache_key
+
+# ==========================================================
+# BULK ZIP EXPORT
+# ==========================================================
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+EXPORT_WORKERS = 4
+
+# Archives are swept once they are this old, or beyond this many on disk
+EXPORT_MAX_AGE_SECONDS = 3600
+EXPORT_MAX_FILES = 20
+EXPORT_SUFFIX = ".zip"
+
+
+def download_to_file(client, file_path, dest_dir):
+    """Stream one report from the Files API to a temp file, never holding it in memory"""
+    fd, temp_path = tempfile.mkstemp(dir=dest_dir, suffix=TEMP_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with client.get(f"/api/2.0/fs/files{file_path}", endpoint='fs_file', stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def sweep_exports(export_dir, max_age=EXPORT_MAX_AGE_SECONDS, max_files=EXPORT_MAX_FILES):
+    """Delete expired archives, and the oldest ones beyond max_files"""
+    archives = []
+    for name in os.listdir(export_dir):
+        if not name.endswith(EXPORT_SUFFIX):
+            continue
+        full_path = os.path.join(export_dir, name)
+        try:
+            archives.append((os.stat(full_path).st_mtime, full_path))
+        except OSError:
+            continue
+
+    archives.sort(reverse=True)
+    cutoff = time.time() - max_age
+    for index, (mtime, full_path) in enumerate(archives):
+        if index >= max_files or mtime < cutoff:
+            _remove_quietly(full_path)
+
+
+def _unique_name(name, used):
+    """Avoid duplicate entry names inside the archive"""
+    candidate, counter = name, 1
+    stem, ext = os.path.splitext(name)
+    while candidate in used:
+        counter += 1
+        candidate = f"{stem} ({counter}){ext}"
+    used.add(candidate)
+    return candidate
+
+
+def build_reports_zip(client, cache, reports, export_dir, progress=None, max_workers=EXPORT_WORKERS):
+    """Build a ZIP of the given reports in export_dir and return its path"""
+    # reports: dicts with path, name, last_modified and file_size.
+    # Cached files are copied straight from the local cache; the rest are
+    # downloaded concurrently and added to the cache once archived.
+    reports = list(reports)
+    total = len(reports)
+    os.makedirs(export_dir, exist_ok=True)
+    sweep_exports(export_dir)
+    fd, zip_path = tempfile.mkstemp(dir=export_dir, suffix=EXPORT_SUFFIX)
+    os.close(fd)
+
+    def fetch(report):
+        key = make_cache_key(report["path"], report["last_modified"], report["file_size"])
+        cached_path = cache.lookup_file(key)
+        if cached_path is not None:
+            return report, key, cached_path, False
+        return report, key, download_to_file(client, report["path"], cache.cache_dir), True
+
+    used_names = set()
+    done = 0
+    handled = set()    # futures whose download has been archived and cleaned up
+    unclaimed = set()  # downloads of the current entry not yet moved into the cache
+    try:
+        # PDFs are already compressed, so entries are stored rather than deflated
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-export") as pool:
+                futures = [pool.submit(fetch, report) for report in reports]
+                try:
+                    for future in as_completed(futures):
+                        report, key, source_path, downloaded = future.result()
+                        if downloaded:
+                            unclaimed.add(source_path)
+                        arcname = _unique_name(report["name"], used_names)
+                        try:
+                            with open(source_path, "rb") as src, archive.open(arcname, "w", force_zip64=True) as dest:
+                                shutil.copyfileobj(src, dest, DOWNLOAD_CHUNK_BYTES)
+                        except FileNotFoundError:
+                            # Evicted from the cache between lookup and copy
+                            source_path = download_to_file(client, report["path"], cache.cache_dir)
+                            downloaded = True
+                            unclaimed.add(source_path)
+                            with open(source_path, "rb") as src, archive.open(arcname, "w", force_zip64=True) as dest:
+                                shutil.copyfileobj(src, dest, DOWNLOAD_CHUNK_BYTES)
+
+                        if downloaded and not cache.put_file(key, source_path):
+                            os.remove(source_path)
+                        unclaimed.clear()
+                        handled.add(future)
+
+                        done += 1
+                        if progress:
+                            progress(done, total, report["name"])
+                except BaseException:
+                    # Downloads that finished but were never archived would leak as .part files
+                    for future in futures:
+                        future.cancel()
+                    for future in futures:
+                        if future in handled or future.cancelled() or future.exception() is not None:
+                            continue
+                        _, _, source_path, downloaded = future.result()
+                        if downloaded:
+                            unclaimed.add(source_path)
+                    for source_path in unclaimed:
+                        _remove_quietly(source_path)
+                    raise
+    except BaseException:
+        _remove_quietly(zip_path)
+        raise
+
+    return zip_path
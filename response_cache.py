@@ -0,0 +1,90 @@
+import hashlib
+import json
+import threading
+import time
+
+from text_utils import normalize_text
+
+# ==========================================================
+# CHATBOT RESPONSE CACHE
+# ==========================================================
+# Rows live in the response_cache table of chat_history.db:
+#   cache_key TEXT PRIMARY KEY, response TEXT, created_at REAL,
+#   last_used REAL, hits INTEGER
+
+
+def make_context_key(endpoint, context):
+    """Stable hash of the endpoint and the normalized conversation sent to it"""
+    normalized = [[msg["role"], normalize_text(msg["content"])] for msg in context]
+    raw = json.dumps([endpoint, normalized], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """TTL + size-bounded LRU cache of chatbot replies persisted in SQLite"""
+
+    def __init__(self, connect, endpoint, ttl_seconds, max_entries):
+        self.connect = connect  # context manager factory yielding a sqlite3 connection
+        self.endpoint = endpoint
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, context):
+        """Cached reply for this context, or None if missing or expired"""
+        key = make_context_key(self.endpoint, context)
+        now = time.time()
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM response_cache WHERE cache_key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE cache_key = ?",
+                    (now, key)
+                )
+                conn.commit()
+
+        self._count(row is not None)
+        return row[0] if row is not None else None
+
+    def put(self, context, response):
+        """Store a reply and evict expired and least recently used rows"""
+        key = make_context_key(self.endpoint, context)
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("""
+                INSERT INTO response_cache (cache_key, response, created_at, last_used, hits)
+                VALUES (?, ?, ?, ?, 0)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    response = excluded.response,
+                    created_at = excluded.created_at,
+                    last_used = excluded.last_used
+            """, (key, response, now, now))
+            conn.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute("""
+                DELETE FROM response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
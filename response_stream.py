@@ -0,0 +1,154 @@
+import itertools
+import json
+
+# ==========================================================
+# RESPONSES-STYLE EVENT STREAM PARSING
+# ==========================================================
+# Serving endpoints answer either with one JSON document holding an
+# "output" list, or with a stream of events (NDJSON or SSE "data:" lines):
+#   response.output_text.delta  -> {"delta": "..."}
+#   response.output_item.done   -> {"item": {"content": [{"type": "output_text", "text": "..."}]}}
+OUTPUT_SEPARATOR = "\n\n---\n\n"
+NO_RESPONSE_TEXT = "No response received. Check model/endpoint status."
+
+TEXT_DELTA_EVENT = "response.output_text.delta"
+ITEM_DONE_EVENT = "response.output_item.done"
+
+# SSE framing lines that carry no payload
+_SSE_IGNORED_PREFIXES = ("event:", "id:", "retry:", ":")
+
+_decoder = json.JSONDecoder()
+
+
+def _output_texts(content_list):
+    return [c.get("text", "") for c in content_list or [] if isinstance(c, dict) and c.get("type") == "output_text"]
+
+
+class ResponseEventParser:
+    """Incremental parser turning byte chunks into decoded JSON events"""
+
+    def __init__(self):
+        self._buffer = bytearray()  # trailing partial line from the previous chunk
+        self._pending = []          # lines of a multi-line (pretty-printed) JSON document
+        self.events = 0
+        self.malformed_lines = 0
+
+    def feed(self, chunk):
+        """Consume a byte chunk and return the events completed by it"""
+        end = chunk.rfind(b"\n")
+        if end == -1:
+            # Still inside one line (or a single-document body)
+            self._buffer += chunk
+            return []
+
+        # Everything up to the last newline is complete UTF-8: decode it in one go
+        if self._buffer:
+            self._buffer += chunk[:end]
+            text = self._buffer.decode("utf-8", errors="replace")
+            self._buffer = bytearray()
+        else:
+            text = chunk[:end].decode("utf-8", errors="replace")
+        self._buffer += chunk[end + 1:]
+
+        events = []
+        for line in text.split("\n"):
+            event = self._parse_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self):
+        """Flush whatever is left once the body has ended"""
+        events = []
+        if self._buffer:
+            event = self._parse_line(self._buffer.decode("utf-8", errors="replace"))
+            self._buffer = bytearray()
+            if event is not None:
+                events.append(event)
+        if self._pending:
+            event = self._decode("".join(self._pending))
+            if event is None:
+                self.malformed_lines += 1
+            else:
+                events.append(event)
+            self._pending = []
+        return events
+
+    def _decode(self, raw):
+        try:
+            data = _decoder.decode(raw)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        self.events += 1
+        return data
+
+    def _parse_line(self, line):
+        if self._pending:
+            # Inside a multi-line document: try to close it on a top-level "}"
+            self._pending.append(line)
+            if line.startswith("}"):
+                event = self._decode("".join(self._pending))
+                if event is not None:
+                    self._pending = []
+                return event
+            return None
+
+        # Fast path: plain NDJSON event
+        if line[:1] == "{":
+            event = self._decode(line)
+            if event is not None:
+                return event
+
+        line = line.strip()
+        if not line or line == "[DONE]" or line == "data: [DONE]" or line.startswith(_SSE_IGNORED_PREFIXES):
+            return None
+        if line.startswith("data:"):
+            line = line[5:].lstrip()
+
+        event = self._decode(line)
+        if event is None:
+            if self.events == 0 and line.startswith("{") and not line.endswith("}"):
+                # Probably the first line of a pretty-printed document
+                self._pending.append(line)
+            else:
+                self.malformed_lines += 1
+        return event
+
+
+def iter_response_text(chunks, parser=None, separator=OUTPUT_SEPARATOR):
+    """Yield reply text from an iterable of byte chunks as soon as it is available"""
+    parser = parser or ResponseEventParser()
+    streamed = False          # saw at least one text delta
+    needs_separator = False   # a finished item precedes the next delta
+    item_texts = []           # full texts from output_item.done / non-streamed output
+
+    def batches():
+        for chunk in chunks:
+            if chunk:
+                yield parser.feed(chunk)
+        yield parser.close()
+
+    for data in itertools.chain.from_iterable(batches()):
+        event_type = data.get("type")
+        if event_type == TEXT_DELTA_EVENT:
+            delta = data.get("delta", "")
+            if delta:
+                if needs_separator:
+                    yield separator
+                    needs_separator = False
+                streamed = True
+                yield delta
+        elif event_type == ITEM_DONE_EVENT:
+            texts = _output_texts(data.get("item", {}).get("content"))
+            item_texts.extend(texts)
+            needs_separator = streamed and bool(texts)
+        elif isinstance(data.get("output"), list):
+            for msg in data["output"]:
+                if isinstance(msg, dict):
+                    item_texts.extend(_output_texts(msg.get("content")))
+
+    # No deltas were sent: fall back to the completed items
+    if not streamed:
+        yield separator.join(item_texts) if item_texts else NO_RESPONSE_TEXT
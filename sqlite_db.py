@@ -0,0 +1,198 @@
+import atexit
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# ==========================================================
+# SQLITE CONNECTION POOL
+# ==========================================================
+# Idle connections kept open per database file
+POOL_MAX_IDLE = 8
+
+# Wait this long for a competing writer instead of failing with "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Per-connection prepared statement cache
+CACHED_STATEMENTS = 256
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SQLitePool:
+    """Long-lived SQLite connections in WAL mode, checked out one operation at a time"""
+
+    def __init__(self, db_file, max_idle=POOL_MAX_IDLE):
+        self.db_file = db_file
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def _open(self):
+        # A connection is only ever used by the thread that checked it out
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the single writer; NORMAL skips
+        # the fsync on every commit (still durable at checkpoints)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Enforce REFERENCES ... ON DELETE CASCADE (off by default in SQLite)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back on return"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+
+def get_pool(db_file):
+    """Process-wide pool for a database file (usable from any thread)"""
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = _pools[db_file] = SQLitePool(db_file)
+        return pool
+
+# ==========================================================
+# SCHEMA MIGRATIONS
+# ==========================================================
+def add_column(conn, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def migrate(pool, migrations):
+    """Apply migrations[user_version:] in order, one transaction each
+
+    Each migration is a callable taking a connection; PRAGMA user_version
+    records how many have been applied.
+    """
+    with pool.connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(migrations[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# ==========================================================
+# WRITE-BEHIND QUEUE
+# ==========================================================
+# Pending writes are committed together at most this often (seconds)
+FLUSH_INTERVAL_SECONDS = 0.5
+
+_writers = {}
+
+
+class WriteBehindQueue:
+    """Buffers writes and commits them in periodic single transactions"""
+
+    def __init__(self, pool, interval=FLUSH_INTERVAL_SECONDS):
+        self.pool = pool
+        self.interval = interval
+        self.rejected = 0  # entries dropped for violating a constraint
+        self._pending = OrderedDict()  # key -> [(sql, params), ...] in submission order
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="sqlite-write-behind", daemon=True)
+        self._thread.start()
+        # Daemon threads die silently at shutdown; make sure nothing is lost
+        atexit.register(self.flush)
+
+    def submit(self, statements, key=None, move_to_end=False):
+        """Queue statements; a later submit with the same key replaces the earlier one"""
+        with self._lock:
+            if key is None:
+                key = ("seq", next(self._counter))
+            self._pending[key] = statements
+            if move_to_end:
+                self._pending.move_to_end(key)
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait()
+            # Let a burst of writes accumulate into one transaction
+            time.sleep(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Writes were put back; retry on the next wake-up
+                self._wake.set()
+
+    def flush(self):
+        """Commit everything queued so far in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, OrderedDict()
+            if not batch:
+                return
+
+            try:
+                with self.pool.connection() as conn:
+                    conn.execute("BEGIN")
+                    for statements in batch.values():
+                        # A constraint failure (e.g. a reply for a chat deleted
+                        # meanwhile) drops that entry, not the whole batch
+                        conn.execute("SAVEPOINT entry")
+                        try:
+                            for sql, params in statements:
+                                conn.execute(sql, params)
+                        except sqlite3.IntegrityError:
+                            conn.execute("ROLLBACK TO entry")
+                            self.rejected += 1
+                        conn.execute("RELEASE entry")
+                    conn.commit()
+            except sqlite3.Error:
+                # Put the batch back in front of anything queued meanwhile
+                with self._lock:
+                    for key, statements in self._pending.items():
+                        batch[key] = statements
+                    self._pending = batch
+                raise
+
+
+def get_writer(db_file):
+    """Process-wide write-behind queue for a database file"""
+    with _pools_lock:
+        writer = _writers.get(db_file)
+    if writer is None:
+        pool = get_pool(db_file)
+        with _pools_lock:
+            writer = _writers.get(db_file)
+            if writer is None:
+                writer = _writers[db_file] = WriteBehindQueue(pool)
+    return writer
@@ -0,0 +1,13 @@
+import re
+
+# ==========================================================
+# TEXT NORMALIZATION
+# ==========================================================
+# Shared by the chatbot reply cache and the report submission queue, so
+# requests differing only in case, spacing or trailing punctuation match
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive form of a message"""
+    return _WHITESPACE.sub(" ", text).strip().lower().rstrip("?!. ")
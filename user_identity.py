@@ -0,0 +1,50 @@
+import uuid
+
+import streamlit as st
+
+# ==========================================================
+# USER IDENTITY
+# ==========================================================
+# Query parameter holding the id of visitors who are not signed in
+USER_ID_PARAM = "uid"
+
+# Anonymous owners are stored as "anon:<uuid4>", apart from signed-in emails
+ANONYMOUS_PREFIX = "anon:"
+
+
+def get_signed_in_email():
+    """Email of the signed-in user, if the app has authentication configured"""
+    user = getattr(st, 'user', None)
+    return user.get('email') if user is not None else None
+
+
+def parse_anonymous_id(value):
+    """Canonical uuid4 string from a uid query parameter, or None if it is not one"""
+    try:
+        parsed = uuid.UUID(value)
+    except (TypeError, ValueError):
+        return None
+    return str(parsed) if parsed.version == 4 and str(parsed) == value.lower() else None
+
+
+def get_user_id():
+    """Signed-in user's email, else "anon:<uuid4>" with the uuid kept in the page URL
+
+    Anonymous visitors keep their chats and report jobs as long as they keep
+    the link. The URL only ever yields an anonymous id, so it cannot be used
+    to act as a signed-in user. Call on every run: page navigation drops
+    query parameters and this puts the id back.
+    """
+    if 'user_id' not in st.session_state:
+        email = get_signed_in_email()
+        if email:
+            st.session_state.user_id = email
+        else:
+            anonymous_id = parse_anonymous_id(st.query_params.get(USER_ID_PARAM)) or str(uuid.uuid4())
+            st.session_state.user_id = ANONYMOUS_PREFIX + anonymous_id
+            st.session_state.anonymous_id = anonymous_id
+
+    anonymous_id = st.session_state.get('anonymous_id')
+    if anonymous_id and st.query_params.get(USER_ID_PARAM) != anonymous_id:
+        st.query_params[USER_ID_PARAM] = anonymous_id
+    return st.session_state.user_id
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from databricks_client import get_databricks_client
+
+# ==========================================================
+# CONFIGURATION
+# ==========================================================
+VOLUME_PATH = st.secrets.get('VOLUME_PATH')
+
+# Reruns within this window share the previous listing instead of hitting the API
+MIN_REFRESH_SECONDS = float(st.secrets.get('REPORT_LISTING_MIN_REFRESH_SECONDS', 10))
+
+LISTING_PAGE_SIZE = 1000
+
+PDF_COLUMNS = ["path", "name", "file_size", "last_modified"]
+
+# ==========================================================
+# SNAPSHOT
+# ==========================================================
+class VolumeSnapshot:
+    """Cached directory listing of the reports volume, merged incrementally"""
+
+    def __init__(self, client, volume_path, min_refresh_seconds=MIN_REFRESH_SECONDS):
+        self.client = client
+        self.volume_path = volume_path
+        self.min_refresh_seconds = min_refresh_seconds
+        self.version = 0
+        self._entries = {}     # path -> directory entry
+        self._changed_at = {}  # path -> version in which the entry was added or changed
+        self._frame = None     # PDF DataFrame for the current version
+        self._last_refresh = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _list_all(self):
+        """Fetch every page of the directory listing"""
+        entries = []
+        params = {"page_size": LISTING_PAGE_SIZE}
+        while True:
+            response = self.client.get(f"/api/2.0/fs/directories{self.volume_path}", endpoint='fs_list', params=params)
+            response.raise_for_status()
+            data = response.json()
+            entries.extend(data.get("contents", []))
+            if not data.get("next_page_token"):
+                return entries
+            params["page_token"] = data["next_page_token"]
+
+    def refresh(self, force=False):
+        """Re-list the volume and merge only new, changed or removed entries"""
+        # One caller lists at a time; the others reuse its result
+        with self._refresh_lock:
+            if not force and time.time() - self._last_refresh < self.min_refresh_seconds:
+                return self.version
+
+            listing = self._list_all()
+            self._last_refresh = time.time()
+
+            with self._lock:
+                next_version = self.version + 1
+                seen = set()
+                changed = False
+                for entry in listing:
+                    path = entry.get("path")
+                    seen.add(path)
+                    previous = self._entries.get(path)
+                    if previous is None or (previous.get("last_modified"), previous.get("file_size")) != (entry.get("last_modified"), entry.get("file_size")):
+                        self._entries[path] = entry
+                        self._changed_at[path] = next_version
+                        changed = True
+
+                for path in set(self._entries) - seen:
+                    del self._entries[path]
+                    del self._changed_at[path]
+                    changed = True
+
+                if changed:
+                    self.version = next_version
+                    self._frame = None
+
+            return self.version
+
+    def changes_since(self, version):
+        """Paths added or modified after the given snapshot version"""
+        with self._lock:
+            return [path for path, changed_at in self._changed_at.items() if changed_at > version]
+
+    def pdf_frame(self):
+        """PDF reports as a DataFrame, rebuilt only when the listing changed"""
+        with self._lock:
+            if self._frame is None:
+                pdfs = [e for e in self._entries.values()
+                        if not e.get("is_directory") and e.get("name", "").endswith(".pdf")]
+                df = pd.DataFrame(pdfs, columns=PDF_COLUMNS)
+                df["last_modified"] = pd.to_datetime(df["last_modified"], unit="ms")
+                self._frame = df.sort_values("last_modified", ascending=False).reset_index(drop=True)
+            return self._frame
+
+
+@st.cache_resource
+def get_volume_snapshot():
+    """Process-wide listing of VOLUME_PATH shared by every session"""
+    return VolumeSnapshot(get_databricks_client(), VOLUME_PATH)